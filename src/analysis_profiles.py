@@ -0,0 +1,93 @@
+import os
+
+# Result keys of TextAnalysis.analyze_text, in output order
+ALL_METRICS = (
+    'Sentences',
+    'Word Tokens',
+    'Filtered Tokens',
+    'Filter Hits',
+    'Vulnerability Score',
+    'POS Tags',
+    'Sentiment',
+    'Language',
+    'Text Score',
+)
+
+# Metrics that need sentiment analysis (TextBlob)
+SENTIMENT_METRICS = frozenset({'Sentiment', 'Text Score'})
+
+TOKENIZERS = ('treebank', 'regex')
+
+# 'lexicon' scores sentiment with the vectorized batch engine instead of one TextBlob per document
+SENTIMENT_ENGINES = ('textblob', 'lexicon')
+DEFAULT_SENTIMENT_ENGINE = os.getenv('SENTIMENT_ENGINE', 'textblob')
+
+# 'profile' detects the language from a bounded sample with preloaded n-gram profiles
+LANGUAGE_DETECTORS = ('langdetect', 'profile')
+DEFAULT_LANGUAGE_DETECTOR = os.getenv('LANGUAGE_DETECTOR', 'langdetect')
+
+
+class AnalysisProfile:
+    """Which metrics `analyze_text` computes and which tokenizer it uses.
+
+    Libraries are only imported for metrics in the profile, so a profile
+    without POS tags, sentiment or language detection never loads them. The
+    'regex' tokenizer avoids importing NLTK at all; its token counts can
+    differ slightly from the Treebank tokenizer on contractions.
+    """
+
+    def __init__(self, name, metrics=ALL_METRICS, tokenizer='treebank', sentiment_engine=None,
+                 language_detector=None):
+        sentiment_engine = sentiment_engine or DEFAULT_SENTIMENT_ENGINE
+        language_detector = language_detector or DEFAULT_LANGUAGE_DETECTOR
+        unknown = set(metrics) - set(ALL_METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metrics in profile '{name}': {sorted(unknown)}")
+        if tokenizer not in TOKENIZERS:
+            raise ValueError(f"Unknown tokenizer: {tokenizer}")
+        if sentiment_engine not in SENTIMENT_ENGINES:
+            raise ValueError(f"Unknown sentiment engine: {sentiment_engine}")
+        if language_detector not in LANGUAGE_DETECTORS:
+            raise ValueError(f"Unknown language detector: {language_detector}")
+        self.name = name
+        self.metrics = tuple(m for m in ALL_METRICS if m in metrics)
+        self.tokenizer = tokenizer
+        self.sentiment_engine = sentiment_engine
+        self.language_detector = language_detector
+
+    def __contains__(self, metric):
+        return metric in self.metrics
+
+    def __repr__(self):
+        return (f"AnalysisProfile({self.name!r}, {self.metrics!r}, tokenizer={self.tokenizer!r}, "
+                f"sentiment_engine={self.sentiment_engine!r}, language_detector={self.language_detector!r})")
+
+    @property
+    def needs_sentiment(self):
+        return bool(SENTIMENT_METRICS.intersection(self.metrics))
+
+    def key(self):
+        """Identity of the profile for caches."""
+        return (self.name, self.metrics, self.tokenizer, self.sentiment_engine, self.language_detector)
+
+
+PROFILES = {
+    'full': AnalysisProfile('full'),
+    'scores': AnalysisProfile('scores', ('Word Tokens', 'Filtered Tokens', 'Filter Hits', 'Vulnerability Score',
+                                         'Sentiment', 'Text Score')),
+    'filter': AnalysisProfile('filter', ('Word Tokens', 'Filtered Tokens', 'Vulnerability Score'),
+                              tokenizer='regex'),
+}
+
+DEFAULT_PROFILE = os.getenv('ANALYSIS_PROFILE', 'full')
+
+
+def get_profile(profile=None):
+    """Resolve a profile name (or pass through a profile); defaults to ANALYSIS_PROFILE."""
+    if isinstance(profile, AnalysisProfile):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown analysis profile: {name}. Available: {', '.join(PROFILES)}")
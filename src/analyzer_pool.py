@@ -0,0 +1,129 @@
+import os
+import threading
+import logging
+from text_analyzer import TextAnalyzer
+from text_analysis import TextAnalysis
+from analysis_profiles import get_profile
+from filter_matcher import FilterMatcher, load_matcher
+
+DEFAULT_MODEL = 'en_core_web_sm'
+
+
+def _filter_file_identity(filter_file):
+    """Identify a filter file by absolute path, size and modification time."""
+    if not filter_file:
+        return None
+    path = os.path.abspath(filter_file)
+    try:
+        stat = os.stat(path)
+        return (path, stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return (path, None, None)
+
+
+class AnalyzerPool:
+    """Thread-safe registry of warm analyzers keyed by model and filter file.
+
+    spaCy models and compiled filter matchers are loaded once and shared. Each thread
+    gets its own TextAnalysis instance because `load_text` mutates analyzer state.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._models = {}
+        self._filter_words = {}
+        self._local = threading.local()
+
+    def load_model(self, model_name=DEFAULT_MODEL):
+        """Load a spaCy model once and return the shared instance."""
+        with self._lock:
+            if model_name not in self._models:
+                import spacy
+                logging.info(f"Loading spaCy model '{model_name}'")
+                self._models[model_name] = spacy.load(model_name)
+            return self._models[model_name]
+
+    def filter_words(self, filter_file, filter_words=None):
+        """Return the shared FilterMatcher for a filter file, compiling it once.
+
+        `filter_words` may be an already loaded FilterMatcher or word list for the file.
+        """
+        identity = _filter_file_identity(filter_file)
+        if identity is None:
+            return FilterMatcher()
+        with self._lock:
+            if identity not in self._filter_words:
+                if filter_words is None:
+                    filter_words = load_matcher(filter_file)
+                elif not isinstance(filter_words, FilterMatcher):
+                    filter_words = FilterMatcher.from_words(filter_words)
+                self._filter_words[identity] = filter_words
+            return self._filter_words[identity]
+
+    def get(self, filter_file=None, model_name=DEFAULT_MODEL, profile=None):
+        """Return a warm TextAnalysis for the calling thread."""
+        profile = get_profile(profile)
+        key = (model_name, _filter_file_identity(filter_file), profile.key())
+        cache = getattr(self._local, 'analyses', None)
+        if cache is None:
+            cache = self._local.analyses = {}
+        analysis = cache.get(key)
+        if analysis is None:
+            analyzer = TextAnalyzer(
+                model_name=model_name,
+                filter_words=self.filter_words(filter_file),
+                model_loader=self.load_model,
+                tokenizer=profile.tokenizer,
+                sentiment_engine=profile.sentiment_engine,
+                language_detector=profile.language_detector,
+            )
+            analysis = cache[key] = TextAnalysis(analyzer=analyzer, profile=profile)
+        return analysis
+
+    def warm_up(self, filter_file=None, model_name=DEFAULT_MODEL, filter_words=None, load_model=False, profile=None):
+        """Preload filter words and the libraries the profile needs so the first file does not pay for them.
+
+        No analysis metric uses the spaCy model, so it is only loaded with `load_model=True`.
+        """
+        profile = get_profile(profile)
+        if filter_file:
+            self.filter_words(filter_file, filter_words)
+        if load_model:
+            self.load_model(model_name)
+        analysis = self.get(filter_file, model_name, profile)
+        # Run the profile once on a short text to import its libraries and load their data
+        try:
+            analysis.analyze_text("This is a short text used to warm up the analyzers.")
+        except Exception as e:
+            logging.warning(f"Analyzer warm-up failed: {e}")
+        return analysis
+
+    def teardown(self):
+        """Drop all cached models, filter words and per-thread analyzers."""
+        with self._lock:
+            self._models.clear()
+            self._filter_words.clear()
+            self._local = threading.local()
+
+
+_default_pool = AnalyzerPool()
+
+
+def get_pool():
+    """Return the process-wide analyzer pool."""
+    return _default_pool
+
+
+def get_analysis(filter_file=None, model_name=DEFAULT_MODEL, profile=None):
+    """Return a warm TextAnalysis from the process-wide pool."""
+    return _default_pool.get(filter_file, model_name, profile)
+
+
+def warm_up(filter_file=None, model_name=DEFAULT_MODEL, filter_words=None, load_model=False, profile=None):
+    """Warm the process-wide pool."""
+    return _default_pool.warm_up(filter_file, model_name, filter_words, load_model, profile)
+
+
+def teardown():
+    """Release everything held by the process-wide pool."""
+    _default_pool.teardown()
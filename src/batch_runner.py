@@ -0,0 +1,304 @@
+import os
+import time
+import queue
+import itertools
+import multiprocessing
+import signal
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import analyzer_pool
+from file_processor import process_file
+from ledger import open_ledger
+from result_cache import open_cache
+from output_writer import PerFileWriter
+from metrics import get_metrics, enable_metrics
+import ngram_stats
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Per-worker settings, set once by the pool initializer
+_worker_filter_file = None
+_worker_timeout = None
+_worker_cache = None
+_worker_started = None
+
+
+class FileTimeoutError(BaseException):
+    """Raised inside a worker when a file exceeds its time budget.
+
+    Derives from BaseException so `except Exception` blocks in the
+    extraction and analysis code cannot swallow it.
+    """
+
+
+def _init_worker(filter_file, timeout, cache_path=None, cache_max_bytes=None, collect_metrics=False,
+                 collect_ngrams=False, started_queue=None):
+    """Pool initializer: load the NLP models once per worker process."""
+    global _worker_filter_file, _worker_timeout, _worker_cache, _worker_started
+    if collect_metrics:
+        enable_metrics()
+    if collect_ngrams:
+        ngram_stats.enable_collection()
+    _worker_filter_file = filter_file
+    _worker_timeout = timeout
+    _worker_started = started_queue
+    # Each worker has its own connection; SQLite serializes writes between processes
+    _worker_cache = open_cache(cache_path, cache_max_bytes) if cache_path else None
+    analyzer_pool.warm_up(filter_file=filter_file)
+
+
+def _on_alarm(signum, frame):
+    raise FileTimeoutError()
+
+
+def _run_task(file_path, task_id=None):
+    """Worker entry point. Returns (file_path, results, error, metrics, ngram_counts) and never raises."""
+    if _worker_started is not None and task_id is not None:
+        # Tell the coordinator when the file actually starts, which is what its fallback timeout measures
+        _worker_started.put((task_id, time.time()))
+    file_path, results, error = _run_file(file_path)
+    # Ship this task's metrics and n-gram counts to the coordinator, which owns the run summary
+    return file_path, results, error, get_metrics().drain(), ngram_stats.drain_collected()
+
+
+def _run_file(file_path):
+    use_alarm = bool(_worker_timeout) and hasattr(signal, 'SIGALRM')
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, _worker_timeout)
+    try:
+        return file_path, process_file(file_path, _worker_filter_file, _worker_cache), None
+    except FileTimeoutError:
+        return file_path, None, f"timed out after {_worker_timeout}s"
+    except Exception as e:
+        return file_path, None, f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class BatchRunner:
+    """Process files on a pool of worker processes.
+
+    Workers only extract and analyze. The coordinator (the calling process)
+    is the single owner of the processed-files ledger and of all output writes.
+    """
+
+    def __init__(self, output_dir, log_file, filter_file=None, workers=None, max_in_flight=None, timeout=None,
+                 cache_path=None, cache_max_bytes=None, writer=None, ngram_stats=None):
+        self.output_dir = output_dir
+        self.writer = writer or PerFileWriter(output_dir)
+        self.log_file = log_file
+        self.filter_file = filter_file
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.timeout = timeout
+        self.cache_path = cache_path
+        self.cache_max_bytes = cache_max_bytes
+        # Corpus n-gram statistics (an NgramStats) fed with the counts each worker returns
+        self.ngram_stats = ngram_stats
+        self.summary = {'processed': 0, 'skipped': 0, 'empty': 0, 'failed': 0, 'timed_out': 0}
+        self._executor = None
+        # Start times reported by the workers, only needed for the fallback timeout
+        self._started_queue = multiprocessing.Queue() if timeout else None
+        self._task_ids = itertools.count()
+
+    def _new_executor(self, workers=None):
+        return ProcessPoolExecutor(
+            max_workers=workers or self.workers,
+            initializer=_init_worker,
+            initargs=(self.filter_file, self.timeout, self.cache_path, self.cache_max_bytes, get_metrics().enabled,
+                      self.ngram_stats is not None, self._started_queue),
+        )
+
+    def _handle_result(self, file_path, results, error, worker_metrics=None, worker_ngrams=None):
+        metrics = get_metrics()
+        metrics.merge(worker_metrics)
+        if worker_ngrams and self.ngram_stats is not None:
+            with metrics.timer('ngram_merge'):
+                self.ngram_stats.add_counts(worker_ngrams)
+        if error:
+            key = 'timed_out' if error.startswith('timed out') else 'failed'
+            self.summary[key] += 1
+            metrics.incr(f"files.{key}")
+            logging.error(f"Error processing file {file_path}: {error}")
+            return
+        if results is None:
+            self.summary['empty'] += 1
+            metrics.incr('files.empty')
+            return
+        try:
+            with metrics.timer('output_write'):
+                self.writer.write(file_path, results)
+            self._ledger.mark_processed(file_path)
+            self.summary['processed'] += 1
+            metrics.incr('files.processed')
+        except Exception as e:
+            self.summary['failed'] += 1
+            metrics.incr('files.failed')
+            logging.error(f"Error saving results for {file_path}: {e}")
+
+    def _note_started(self, pending, started):
+        """Record the start times workers have reported for tasks still in flight."""
+        if self._started_queue is None:
+            return
+        live = {task_id for _, task_id in pending.values()}
+        while True:
+            try:
+                task_id, started_at = self._started_queue.get_nowait()
+            except queue.Empty:
+                return
+            if task_id in live:
+                started[task_id] = started_at
+
+    def _expire_hung(self, pending, started):
+        """Give up on tasks that outlived the timeout without the worker interrupting them."""
+        if not self.timeout:
+            return False
+        # Workers enforce the timeout themselves where SIGALRM exists; this is the fallback.
+        # Tasks still waiting for a worker have no start time and are never expired.
+        self._note_started(pending, started)
+        deadline = time.time() - self.timeout * 1.5
+        expired = [future for future, (_, task_id) in pending.items()
+                   if started.get(task_id, deadline) < deadline]
+        for future in expired:
+            file_path, task_id = pending.pop(future)
+            started.pop(task_id, None)
+            future.cancel()
+            self.summary['timed_out'] += 1
+            get_metrics().incr('files.timed_out')
+            logging.error(f"Error processing file {file_path}: timed out after {self.timeout}s")
+        return bool(expired)
+
+    def _run_isolated(self, file_paths):
+        """Rerun files that were in flight when a worker crashed, one at a time in a pool of one.
+
+        Any of them may have killed the worker, so only a file that breaks this
+        pool too is reported as crashed. Returns True if a hung task was abandoned.
+        """
+        abandoned = False
+        executor = self._new_executor(workers=1)
+        try:
+            for file_path in file_paths:
+                logging.info(f"Retrying file on its own after a worker crash: {file_path}")
+                task_id = next(self._task_ids)
+                future = executor.submit(_run_task, file_path, task_id)
+                pending = {future: (file_path, task_id)}
+                started = {}
+                while pending:
+                    wait([future], timeout=self.timeout or None)
+                    if future.done():
+                        pending.clear()
+                        try:
+                            self._handle_result(*future.result())
+                        except BrokenProcessPool as e:
+                            self._handle_result(file_path, None, f"worker crashed: {e}")
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            executor = self._new_executor(workers=1)
+                    elif self._expire_hung(pending, started):
+                        # The only worker is stuck in the expired task
+                        abandoned = True
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        executor = self._new_executor(workers=1)
+        finally:
+            executor.shutdown(wait=not abandoned, cancel_futures=True)
+        return abandoned
+
+    def run(self, file_paths, keep_alive=False):
+        """Process every path in `file_paths` and return a summary of outcomes.
+
+        With `keep_alive`, the warm worker pool is kept for the next call (e.g. the
+        next batch in watch mode) until `close()`.
+        """
+        self._ledger = open_ledger(self.log_file)
+        self.writer.bind_ledger(self._ledger)
+        paths = iter(file_paths)
+        pending = {}
+        started = {}
+        abandoned = False
+        executor = self._executor or self._new_executor()
+        self._executor = None
+
+        def submit(file_path):
+            task_id = next(self._task_ids)
+            try:
+                future = executor.submit(_run_task, file_path, task_id)
+            except BrokenProcessPool as e:
+                # The pool broke since the last wait; the file is retried with the others in flight
+                future = Future()
+                future.set_exception(e)
+            pending[future] = (file_path, task_id)
+
+        def submit_next():
+            for file_path in paths:
+                if self._ledger.is_processed(file_path):
+                    logging.info(f"Skipping already processed file: {file_path}")
+                    self.summary['skipped'] += 1
+                    get_metrics().incr('ledger.hit')
+                    continue
+                get_metrics().incr('ledger.miss')
+                logging.info(f"Processing file: {file_path}")
+                submit(file_path)
+                return True
+            return False
+
+        try:
+            while len(pending) < self.max_in_flight and submit_next():
+                pass
+
+            while pending:
+                done, _ = wait(list(pending), timeout=self.timeout or None, return_when=FIRST_COMPLETED)
+                suspects = []
+                # In submission order, so retried files keep their order
+                for future in [future for future in pending if future in done]:
+                    file_path, task_id = pending.pop(future)
+                    started.pop(task_id, None)
+                    try:
+                        self._handle_result(*future.result())
+                    except BrokenProcessPool:
+                        suspects.append(file_path)
+
+                if suspects:
+                    # A crashed worker poisons the pool, and the error does not say which file killed it
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    for future, (file_path, _) in pending.items():
+                        if future.done() and not future.cancelled() and future.exception() is None:
+                            self._handle_result(*future.result())
+                        else:
+                            suspects.append(file_path)
+                    pending.clear()
+                    started.clear()
+                    abandoned = self._run_isolated(suspects) or abandoned
+                    executor = self._new_executor()
+
+                abandoned = self._expire_hung(pending, started) or abandoned
+
+                while len(pending) < self.max_in_flight and submit_next():
+                    pass
+        finally:
+            if keep_alive and not abandoned:
+                self._executor = executor
+            else:
+                # Do not block on workers stuck in a task we already gave up on
+                executor.shutdown(wait=not abandoned, cancel_futures=True)
+            self.writer.flush()
+            self._ledger.commit()
+
+        logging.info(f"Batch run finished: {self.summary}")
+        return self.summary
+
+    def close(self):
+        """Shut down a worker pool kept alive by `run(..., keep_alive=True)`."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+def run_parallel(file_paths, output_dir, log_file, filter_file=None, workers=None, max_in_flight=None, timeout=None,
+                 cache_path=None, cache_max_bytes=None, writer=None):
+    """Process files in parallel and return a summary of outcomes."""
+    runner = BatchRunner(output_dir, log_file, filter_file, workers, max_in_flight, timeout, cache_path, cache_max_bytes,
+                         writer)
+    return runner.run(file_paths)
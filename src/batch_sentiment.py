@@ -0,0 +1,212 @@
+import os
+import logging
+import threading
+import importlib.util
+from collections import namedtuple
+from xml.etree import ElementTree
+
+# NumPy is imported by the engine itself so lightweight profiles never load it
+
+Sentiment = namedtuple('Sentiment', ['polarity', 'subjectivity'])
+
+NEGATIONS = frozenset({'no', 'not', "n't", 'never'})
+
+# Per-token flags packed below the lexicon index
+_NEGATION = 1       # negation word ("not", "n't", ...)
+_NEGATION_LONG = 2  # unknown negation longer than two characters (drops a pending intensifier)
+_RESET_MODIFIER = 4  # unknown word longer than two characters (drops a pending intensifier)
+_RESET_NEGATION = 8  # unknown word longer than one character (drops a pending negation)
+_EXCLAMATION = 16
+_FLAG_BITS = 5
+
+_MAX_TOKEN_CODES = 500000
+
+
+def default_lexicon_path():
+    """Path of TextBlob's `en-sentiment.xml`, found without importing TextBlob (or SENTIMENT_LEXICON_PATH)."""
+    path = os.getenv('SENTIMENT_LEXICON_PATH')
+    if path:
+        return path
+    spec = importlib.util.find_spec('textblob')
+    if spec is None or not spec.submodule_search_locations:
+        raise FileNotFoundError("TextBlob is not installed; set SENTIMENT_LEXICON_PATH to an en-sentiment.xml file")
+    return os.path.join(list(spec.submodule_search_locations)[0], 'en', 'en-sentiment.xml')
+
+
+def load_lexicon(path):
+    """Read a pattern/TextBlob sentiment XML into `{word: (polarity, subjectivity, intensity, is_modifier)}`.
+
+    Scores are averaged per part of speech and then across parts of speech, and
+    adjectives are mirrored to their "-ly" adverbs, as TextBlob's English analyzer does.
+    """
+    senses = {}
+    for node in ElementTree.parse(path).getroot().iter('word'):
+        word = node.attrib.get('form')
+        if not word:
+            continue
+        scores = (float(node.attrib.get('polarity', 0.0)), float(node.attrib.get('subjectivity', 0.0)),
+                  float(node.attrib.get('intensity', 1.0)))
+        senses.setdefault(word, {}).setdefault(node.attrib.get('pos'), []).append(scores)
+
+    def average(rows):
+        return tuple(sum(column) / len(column) for column in zip(*rows))
+
+    words = {}
+    for word, by_pos in senses.items():
+        by_pos = {pos: average(rows) for pos, rows in by_pos.items()}
+        by_pos[None] = average(list(by_pos.values()))
+        words[word] = by_pos
+    for word, by_pos in list(words.items()):
+        if 'JJ' in by_pos:
+            adverb = word[:-1] + 'i' if word.endswith('y') else word
+            adverb = adverb[:-2] if adverb.endswith('le') else adverb
+            entry = words.setdefault(adverb + 'ly', {})
+            entry['RB'] = entry[None] = by_pos['JJ']
+    return {word: (*by_pos[None], 'RB' in by_pos) for word, by_pos in words.items()}
+
+
+class BatchSentiment:
+    """Lexicon sentiment scored for many tokenized documents at once with NumPy.
+
+    The lexicon is compiled into arrays indexed by word id. Each token is mapped
+    to a word id plus flags in one pass; intensifiers ("very good"), negations
+    ("not good") and exclamation marks are then resolved with array operations
+    over all documents together. Results follow TextBlob's pattern analyzer
+    closely but not exactly: it runs on the document's own tokens and ignores
+    emoticons.
+    """
+
+    def __init__(self, lexicon_path=None):
+        import numpy as np
+        self._np = np
+        lexicon = load_lexicon(lexicon_path or default_lexicon_path())
+        self.vocabulary = {word: i for i, word in enumerate(lexicon)}
+        values = list(lexicon.values())
+        self.polarity = np.array([v[0] for v in values], dtype=np.float64)
+        self.subjectivity = np.array([v[1] for v in values], dtype=np.float64)
+        self.intensity = np.array([v[2] for v in values], dtype=np.float64)
+        self.is_modifier = np.array([v[3] for v in values], dtype=bool)
+        self.is_ly = np.array([word.endswith('ly') for word in lexicon], dtype=bool)
+        self._codes = {}
+        self._lock = threading.Lock()
+
+    def _code(self, token):
+        """Pack a token's lexicon index (+1, 0 when unknown) and flags into one int."""
+        index = self.vocabulary.get(token, -1)
+        flags = 0
+        if token in NEGATIONS or token.endswith("n't"):
+            flags |= _NEGATION
+            if index < 0 and len(token) > 2:
+                flags |= _NEGATION_LONG
+        elif index < 0:
+            if len(token) > 2:
+                flags |= _RESET_MODIFIER
+            if len(token.strip("'")) > 1:
+                flags |= _RESET_NEGATION
+            if token == '!':
+                flags |= _EXCLAMATION
+        return ((index + 1) << _FLAG_BITS) | flags
+
+    def _encode(self, tokens):
+        codes = self._codes
+        with self._lock:
+            if len(codes) > _MAX_TOKEN_CODES:
+                codes.clear()
+            packed = []
+            for token in tokens:
+                code = codes.get(token)
+                if code is None:
+                    code = codes[token] = self._code(token)
+                packed.append(code)
+        return self._np.array(packed, dtype=self._np.int64)
+
+    def score(self, documents):
+        """Return a Sentiment(polarity, subjectivity) for each list of lowercased tokens."""
+        np = self._np
+        lengths = np.array([len(tokens) for tokens in documents], dtype=np.int64)
+        num_docs = len(documents)
+        packed = self._encode(token for tokens in documents for token in tokens)
+        if not packed.size:
+            return [Sentiment(0.0, 0.0)] * num_docs
+        ids = (packed >> _FLAG_BITS) - 1
+        flags = packed & ((1 << _FLAG_BITS) - 1)
+        positions = np.arange(packed.size)
+        doc_of = np.repeat(np.arange(num_docs), lengths)
+        doc_start = np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+        known = np.flatnonzero(ids >= 0)
+        if not known.size:
+            return [Sentiment(0.0, 0.0)] * num_docs
+        word = ids[known]
+        start = doc_start[known]
+
+        # Previous known word in the same document
+        prev = np.concatenate(([-1], known[:-1]))
+        prev[prev < start] = -1
+        has_prev = prev >= 0
+        prev_word = np.where(has_prev, np.concatenate(([0], word[:-1])), 0)
+
+        # Running counts and last positions of the tokens that break intensifier and negation scope
+        resets = np.cumsum((flags & _RESET_MODIFIER) > 0)
+        long_negations = np.cumsum((flags & _NEGATION_LONG) > 0)
+        last_negation = np.maximum.accumulate(np.where(flags & _NEGATION, positions, -1))
+        last_negation_reset = np.maximum.accumulate(np.where(flags & _RESET_NEGATION, positions, -1))
+        before = np.maximum(known - 1, 0)
+        safe_prev = np.maximum(prev, 0)
+
+        # An intensifier applies to the next known word unless a longer unknown word intervenes
+        linked = (has_prev & self.is_modifier[prev_word]
+                  & (resets[before] == resets[safe_prev])
+                  & ((long_negations[before] == long_negations[safe_prev]) | self.is_ly[prev_word]))
+        # A negation applies until the next known word or a longer unknown word
+        negation = np.where(known > 0, last_negation[before], -1)
+        negated = ((negation >= np.where(has_prev, prev, start))
+                   & (negation > np.where(known > 0, last_negation_reset[before], -1)))
+
+        intensity = self.intensity[word]
+        effective = np.where(negated, 1.0 / intensity, intensity)
+        multiplier = np.concatenate(([1.0], effective[:-1]))
+        polarity = np.where(linked, np.clip(self.polarity[word] * multiplier, -1.0, 1.0), self.polarity[word])
+        subjectivity = np.where(linked, np.clip(self.subjectivity[word] * multiplier, -1.0, 1.0),
+                                self.subjectivity[word])
+
+        # Chains of intensifiers collapse into one assessment scored by its last word
+        group_starts = np.flatnonzero(~linked)
+        group_of = np.cumsum(~linked) - 1
+        group_last = np.concatenate((group_starts[1:] - 1, [known.size - 1]))
+        group_polarity = polarity[group_last]
+        group_subjectivity = subjectivity[group_last]
+        group_negated = np.logical_or.reduceat(negated, group_starts)
+
+        # Each "!" boosts the assessment before it, unless the next word extends that assessment
+        exclamations = np.flatnonzero(flags & _EXCLAMATION)
+        if exclamations.size:
+            before_mark = np.searchsorted(known, exclamations) - 1
+            valid = before_mark >= 0
+            before_mark = np.maximum(before_mark, 0)
+            valid &= known[before_mark] >= doc_start[exclamations]
+            next_mark = np.minimum(before_mark + 1, known.size - 1)
+            valid &= (before_mark + 1 == known.size) | ~linked[next_mark]
+            boosts = np.bincount(group_of[before_mark[valid]], minlength=group_starts.size)
+            group_polarity = np.clip(group_polarity * 1.25 ** boosts, -1.0, 1.0)
+
+        group_polarity = np.where(group_negated, group_polarity * -0.5, group_polarity)
+        group_doc = doc_of[known[group_last]]
+        counts = np.maximum(np.bincount(group_doc, minlength=num_docs), 1)
+        polarities = np.bincount(group_doc, weights=group_polarity, minlength=num_docs) / counts
+        subjectivities = np.bincount(group_doc, weights=group_subjectivity, minlength=num_docs) / counts
+        return [Sentiment(float(p), float(s)) for p, s in zip(polarities, subjectivities)]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_batch_sentiment():
+    """Return the process-wide BatchSentiment, compiling the lexicon on first use."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = BatchSentiment()
+            logging.info(f"Loaded sentiment lexicon with {len(_engine.vocabulary)} words")
+        return _engine
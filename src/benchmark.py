@@ -0,0 +1,298 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import logging
+import platform
+import tracemalloc
+from contextlib import contextmanager
+from synthetic_corpus import CorpusGenerator
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class StageTimer:
+    """Collect per-stage latencies."""
+
+    def __init__(self):
+        self.samples = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+    def summary(self):
+        return {
+            name: {
+                'count': len(values),
+                'total_s': round(sum(values), 6),
+                'mean_ms': round(sum(values) / len(values) * 1000, 3),
+                'p50_ms': round(percentile(values, 50) * 1000, 3),
+                'p90_ms': round(percentile(values, 90) * 1000, 3),
+                'p99_ms': round(percentile(values, 99) * 1000, 3),
+            }
+            for name, values in self.samples.items()
+        }
+
+
+def _run_suite(name, items, body, documents=None, memory_items=5):
+    """Time `body(item, timer)` over all items and measure throughput and peak memory.
+
+    `documents` is the number of documents the items hold when they are batches.
+    Tracing allocations slows Python code down several times, so the timed loop
+    runs untraced and peak memory comes from a second pass over the first
+    `memory_items` items.
+    """
+    timer = StageTimer()
+    start = time.perf_counter()
+    for item in items:
+        body(item, timer)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        for item in items[:memory_items]:
+            body(item, StageTimer())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    logging.info(f"Benchmark suite '{name}' finished in {elapsed:.2f}s")
+    documents = len(items) if documents is None else documents
+    return {
+        'documents': documents,
+        'elapsed_s': round(elapsed, 6),
+        'throughput_docs_s': round(documents / elapsed, 3) if elapsed else 0.0,
+        'peak_memory_mb': round(peak / (1024 * 1024), 3),
+        'stages': timer.summary(),
+    }
+
+
+def bench_analyzer(texts, filter_file):
+    """Time tokenization, POS tagging, sentiment and language detection."""
+    from analyzer_pool import get_analysis
+    analysis = get_analysis(filter_file)
+    analyzer = analysis.analyzer
+
+    def body(text, timer):
+        with timer.stage('load_text'):
+            doc = analyzer.load_text(text)
+        with timer.stage('tokenize'):
+            doc.tokens
+            doc.sentences
+        with timer.stage('filter'):
+            doc.filtered_tokens(analysis.filter_words)
+        with timer.stage('pos'):
+            analyzer.pos_tagging(doc, limit=5)
+        with timer.stage('sentiment'):
+            analyzer.sentiment_analysis(doc)
+        with timer.stage('language'):
+            try:
+                analyzer.language_detection(doc)
+            except Exception:
+                pass
+        with timer.stage('analyze_text'):
+            analysis.analyze_text(text)
+
+    return _run_suite('analyzer', texts, body)
+
+
+def bench_sentiment(texts, batch_size=32):
+    """Time per-document TextBlob sentiment against the vectorized lexicon engine on the same batches."""
+    from document import ParsedDocument
+    from text_analyzer import TextAnalyzer
+    textblob_analyzer = TextAnalyzer(sentiment_engine='textblob')
+    lexicon_analyzer = TextAnalyzer(sentiment_engine='lexicon')
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+
+    def body(batch, timer):
+        docs = [ParsedDocument(text, 'regex') for text in batch]
+        with timer.stage('tokenize'):
+            for doc in docs:
+                doc.tokens
+        with timer.stage('textblob'):
+            textblob_analyzer.sentiment_batch(docs)
+        with timer.stage('lexicon_batch'):
+            lexicon_analyzer.sentiment_batch(docs)
+
+    return _run_suite('sentiment', batches, body, documents=len(texts))
+
+
+def bench_extractor(image_paths):
+    """Time `process_image` per image, split into the stages it records itself.
+
+    The extractor is the configured one (preprocess engine, OCR mode, region
+    planning and pHash index), so the report matches what a run does. Stages
+    that run more than once per image, such as 'ocr_region', are summed per image.
+    """
+    from file_processor import get_extractor
+    from metrics import get_metrics, enable_metrics, disable_metrics
+    was_enabled = get_metrics().enabled
+    metrics = get_metrics() if was_enabled else enable_metrics()
+    metrics.drain()
+    extractor = get_extractor()
+
+    def body(path, timer):
+        with timer.stage('process_image'):
+            extractor.process_image(path)
+        # Includes 'image_preprocess' (decoding through contours) and 'image_ocr' for every engine and mode
+        for stage, (_, total, _) in metrics.drain()['stages'].items():
+            timer.samples.setdefault(stage, []).append(total)
+
+    try:
+        return _run_suite('extractor', image_paths, body)
+    finally:
+        if not was_enabled:
+            disable_metrics()
+
+
+def bench_io(paths, output_dir, filter_file):
+    """Time file reading and result writing around the analysis."""
+    from file_processor import extract_text, save_results, output_name
+    from analyzer_pool import get_analysis
+    analysis = get_analysis(filter_file)
+
+    def body(path, timer):
+        with timer.stage('file_read'):
+            text = extract_text(path)
+        results = {'extracted_text': text, 'analysis_results': analysis.analyze_text(text)}
+        with timer.stage('output_write'):
+            save_results(results, output_name(path), output_dir)
+
+    return _run_suite('io', paths, body)
+
+
+def run_benchmarks(work_dir, seed=42, text_docs=50, json_docs=20, image_docs=5, doc_chars=5000, suites=None):
+    """Generate a corpus in `work_dir` and run the selected suites."""
+    suites = suites or ('analyzer', 'sentiment', 'io', 'extractor')
+    generator = CorpusGenerator(seed)
+    corpus_dir = os.path.join(work_dir, 'corpus')
+    paths = generator.write_corpus(corpus_dir, text_docs, json_docs, image_docs if 'extractor' in suites else 0,
+                                   doc_chars)
+    filter_file = generator.write_lexicon(os.path.join(work_dir, 'lexicon.txt'))
+    text_paths = [p for p in paths if p.endswith(('.txt', '.json'))]
+    image_paths = [p for p in paths if p.endswith('.png')]
+
+    report = {
+        'meta': {
+            'seed': seed,
+            'doc_chars': doc_chars,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'suites': {},
+    }
+    texts = []
+    for path in text_paths:
+        with open(path, 'r', encoding='utf-8') as file:
+            texts.append(file.read())
+    if 'analyzer' in suites:
+        report['suites']['analyzer'] = bench_analyzer(texts, filter_file)
+    if 'sentiment' in suites:
+        report['suites']['sentiment'] = bench_sentiment(texts)
+    if 'io' in suites:
+        report['suites']['io'] = bench_io(text_paths, os.path.join(work_dir, 'output'), filter_file)
+    if 'extractor' in suites and image_paths:
+        report['suites']['extractor'] = bench_extractor(image_paths)
+    return report
+
+
+def compare_reports(current, baseline, threshold=0.10):
+    """Compare p50 stage latencies and throughput against a baseline report.
+
+    Returns a list of rows and whether any metric regressed by more than `threshold`.
+    """
+    rows = []
+    regressed = False
+    for suite, result in current['suites'].items():
+        base = baseline.get('suites', {}).get(suite)
+        if not base:
+            continue
+        for stage, stats in result['stages'].items():
+            base_stats = base['stages'].get(stage)
+            if not base_stats or not base_stats['p50_ms']:
+                continue
+            change = stats['p50_ms'] / base_stats['p50_ms'] - 1
+            is_regression = change > threshold
+            regressed = regressed or is_regression
+            rows.append((suite, stage, 'p50_ms', base_stats['p50_ms'], stats['p50_ms'], change, is_regression))
+        if base['throughput_docs_s']:
+            change = result['throughput_docs_s'] / base['throughput_docs_s'] - 1
+            is_regression = change < -threshold
+            regressed = regressed or is_regression
+            rows.append((suite, '*', 'docs/s', base['throughput_docs_s'], result['throughput_docs_s'], change,
+                         is_regression))
+    return rows, regressed
+
+
+def format_report(report):
+    lines = []
+    for suite, result in report['suites'].items():
+        lines.append(f"[{suite}] {result['documents']} docs in {result['elapsed_s']:.2f}s, "
+                     f"{result['throughput_docs_s']} docs/s, peak {result['peak_memory_mb']} MB")
+        for stage, stats in result['stages'].items():
+            lines.append(f"  {stage:<16} n={stats['count']:<5} p50={stats['p50_ms']:>9.3f}ms "
+                         f"p90={stats['p90_ms']:>9.3f}ms p99={stats['p99_ms']:>9.3f}ms")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stage-level benchmarks on a synthetic corpus.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--text-docs', type=int, default=50)
+    parser.add_argument('--json-docs', type=int, default=20)
+    parser.add_argument('--image-docs', type=int, default=5)
+    parser.add_argument('--doc-chars', type=int, default=5000)
+    parser.add_argument('--suites', default='analyzer,sentiment,io,extractor', help='Comma-separated suites to run')
+    parser.add_argument('--work-dir', help='Keep the generated corpus and outputs here')
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    parser.add_argument('--baseline', help='Compare against a stored JSON report')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Allowed relative regression')
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='textprocessor-bench-')
+    try:
+        report = run_benchmarks(work_dir, args.seed, args.text_docs, args.json_docs, args.image_docs,
+                                args.doc_chars, tuple(args.suites.split(',')))
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4)
+        logging.info(f"Benchmark report saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        rows, regressed = compare_reports(report, baseline, args.threshold)
+        for suite, stage, metric, before, after, change, is_regression in rows:
+            flag = '  REGRESSION' if is_regression else ''
+            print(f"{suite}/{stage} {metric}: {before} -> {after} ({change:+.1%}){flag}")
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import re
+from filter_matcher import FilterMatcher, FilterMatches
+
+# NLTK and TextBlob are imported on first use so lightweight profiles never load them
+
+# Rough stand-in for the Treebank tokenizer: words (with inner apostrophes) and punctuation
+_REGEX_TOKEN = re.compile(r"\w+(?:'\w+)*|[^\w\s]")
+_REGEX_SENTENCE_END = re.compile(r'[.!?]+(?:\s+|$)')
+
+# The perceptron tagger looks two tokens ahead, so tagging this many extra
+# tokens past a limit gives the same tags as tagging the whole text.
+POS_LOOKAHEAD = 2
+
+
+class ParsedDocument:
+    """Text that is tokenized and sentence-split once, with memoized derived views."""
+
+    def __init__(self, text, tokenizer='treebank'):
+        self.text = text
+        self.tokenizer = tokenizer
+        self.processed_text = text.lower()
+        self._tokens = None
+        self._sentences = None
+        self._pos_tags = []
+        self._pos_complete = False
+        self._ngrams = {}
+        self._filtered = {}
+        self._sentiment = None
+        self._memo = {}
+
+    @property
+    def tokens(self):
+        """Word tokens of the lowercased text."""
+        if self._tokens is None:
+            if self.tokenizer == 'regex':
+                self._tokens = _REGEX_TOKEN.findall(self.processed_text)
+            else:
+                from nltk.tokenize import word_tokenize
+                self._tokens = word_tokenize(self.processed_text)
+        return self._tokens
+
+    @property
+    def sentences(self):
+        """Sentences of the lowercased text."""
+        if self._sentences is None:
+            if self.tokenizer == 'regex':
+                self._sentences = [s for s in _REGEX_SENTENCE_END.split(self.processed_text) if s.strip()]
+            else:
+                import nltk
+                self._sentences = nltk.sent_tokenize(self.processed_text)
+        return self._sentences
+
+    def pos_tags(self, limit=None):
+        """Tag parts of speech, only for the first `limit` tokens when given."""
+        import nltk
+        tokens = self.tokens
+        if limit is None or limit >= len(tokens):
+            if not self._pos_complete:
+                self._pos_tags = nltk.pos_tag(tokens)
+                self._pos_complete = True
+            return self._pos_tags
+        if len(self._pos_tags) < limit and not self._pos_complete:
+            self._pos_tags = nltk.pos_tag(tokens[:limit + POS_LOOKAHEAD])[:limit]
+        return self._pos_tags[:limit]
+
+    def ngrams(self, n):
+        """List of n-gram tuples over the tokens."""
+        if n not in self._ngrams:
+            from nltk.util import ngrams
+            self._ngrams[n] = list(ngrams(self.tokens, n))
+        return self._ngrams[n]
+
+    def filtered_tokens(self, filter_words):
+        """FilterMatches for a FilterMatcher (phrases and weights) or a plain filter-word set."""
+        key = id(filter_words)
+        cached = self._filtered.get(key)
+        if cached is None or cached[0] is not filter_words:
+            if isinstance(filter_words, FilterMatcher):
+                matches = filter_words.match(self.tokens)
+            else:
+                matches = FilterMatches(t for t in self.tokens if t in filter_words)
+            cached = self._filtered[key] = (filter_words, matches)
+        return cached[1]
+
+    @property
+    def sentiment(self):
+        """TextBlob sentiment of the lowercased text."""
+        if self._sentiment is None:
+            from textblob import TextBlob
+            self._sentiment = TextBlob(self.processed_text).sentiment
+        return self._sentiment
+
+    def memo(self, key, factory):
+        """Compute a derived view once per document and cache it under `key`."""
+        if key not in self._memo:
+            self._memo[key] = factory()
+        return self._memo[key]
@@ -1,14 +1,18 @@
 import os
 import json
+import hashlib
 import logging
-from text_analysis import TextAnalysis
-from text_extraction import TextExtractor
+from analyzer_pool import get_analysis
+from ledger import open_ledger, hash_file
+from streaming import analyze_stream, iter_json_strings
+from metrics import get_metrics
+import ngram_stats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def load_processed_files(log_file):
-    """Load the list of processed files from the JSON log file."""
+    """Load the list of processed files from a legacy JSON log file."""
     if os.path.exists(log_file):
         try:
             with open(log_file, 'r', encoding='utf-8') as file:
@@ -18,7 +22,7 @@ def load_processed_files(log_file):
     return set()
 
 def save_processed_file(file_name, log_file):
-    """Save a processed file's name to the JSON log file."""
+    """Save a processed file's name to a legacy JSON log file."""
     processed_files = load_processed_files(log_file)
     processed_files.add(file_name)
     try:
@@ -27,70 +31,248 @@ def save_processed_file(file_name, log_file):
     except IOError as e:
         logging.error(f"Error writing to log file '{log_file}': {e}")
 
-def analyze_and_save(file_path, output_dir, log_file, filter_file=None):
-    """Analyze a file and save the extracted text and analysis results to a JSON file in the specified output directory."""
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.tif', '.tiff', '.bmp', '.gif')
+TEXT_EXTENSIONS = ('.json', '.jsonl', '.txt')
+
+# Text and JSON files larger than this are analyzed in chunks (0 disables streaming)
+STREAMING_THRESHOLD = int(float(os.getenv('STREAMING_THRESHOLD_MB', '64')) * 1024 * 1024)
+
+_extractor = None
+
+def get_extractor():
+    """Return the shared TextExtractor, configured from the environment.
+
+    Set PHASH_INDEX_PATH to reuse OCR results across near-duplicate images;
+    PHASH_MAX_DISTANCE and PHASH_MAX_ENTRIES tune the match threshold and index size.
+    """
+    global _extractor
+    if _extractor is None:
+        # Imported here so text-only runs never load OpenCV or Tesseract bindings
+        from text_extraction import TextExtractor
+        from phash_index import open_phash_index
+        phash_index = None
+        phash_index_path = os.getenv('PHASH_INDEX_PATH')
+        if phash_index_path:
+            phash_index = open_phash_index(
+                phash_index_path,
+                max_distance=int(os.getenv('PHASH_MAX_DISTANCE', '4')),
+                max_entries=int(os.getenv('PHASH_MAX_ENTRIES', '10000')),
+            )
+        _extractor = TextExtractor(phash_index=phash_index)
+    return _extractor
+
+def is_supported(file_path):
+    """Check whether the file type can be processed."""
+    return file_path.lower().endswith(IMAGE_EXTENSIONS + TEXT_EXTENSIONS)
+
+def extraction_config(file_path, extractor=None):
+    """Settings that determine the text extracted from a file, used to key cached results."""
+    if file_path.lower().endswith(IMAGE_EXTENSIONS):
+        return {'reader': 'image', **(extractor or get_extractor()).config()}
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in ('.json', '.jsonl'):
+        # JSON is read as its string values only, the same as when it is streamed
+        return {'reader': extension, 'text': 'strings'}
+    return {'reader': extension}
+
+def prefetch_images(file_paths):
+    """Pair each path with its PreprocessedImage, or None, preparing upcoming images in the background.
+
+    With the 'fast' preprocess engine, images are decoded and binarized on the
+    preprocessor's threads while earlier files are OCR'd and analyzed. Other
+    files, and every file under the legacy engine, are paired with None.
+    """
+    file_paths = list(file_paths)
+    images = [path for path in file_paths if path.lower().endswith(IMAGE_EXTENSIONS)]
+    preprocessor = get_extractor().preprocessor if images else None
+    if preprocessor is None:
+        return ((path, None) for path in file_paths)
+    prepared = preprocessor.prepare_batch(images)
+    return ((path, next(prepared) if path.lower().endswith(IMAGE_EXTENSIONS) else None) for path in file_paths)
+
+def extract_text(file_path, extractor=None, prepared=None):
+    """Extract text from an image, JSON or text file. Returns None if nothing could be extracted.
+
+    For images, `prepared` may be the file's PreprocessedImage from `prefetch_images`.
+    """
+    if file_path.lower().endswith(IMAGE_EXTENSIONS):
+        # Extract text from image
+        extractor = extractor or get_extractor()
+        with get_metrics().timer('ocr_image'):
+            results = extractor.process_image(file_path, prepared)
+
+        if not results:
+            logging.error(f"No text extracted from image {file_path}.")
+            return None
+
+        # Combine extracted text from all areas
+        extracted_text = "\n".join([res['text'] for res in results])
+        logging.debug(f"Extracted text from image {file_path}: '{extracted_text}'")
+        return extracted_text
+
+    if file_path.lower().endswith(TEXT_EXTENSIONS):
+        with get_metrics().timer('file_read'):
+            return _read_text_file(file_path)
+
+    logging.error(f"Unsupported file type: {file_path}. Supported types are image files, JSON files, and text files.")
+    return None
+
+def _read_text_file(file_path):
+    """Read a text file as a string; for JSON and JSON Lines, only the string values (not keys or syntax)."""
+    if file_path.lower().endswith(('.json', '.jsonl')):
+        # Same text as the streamed path, so token counts do not depend on the file size
+        with open(file_path, 'r', encoding='utf-8') as file:
+            # The whole file is read anyway; one piece per value keeps long strings unsplit
+            return "\n".join(iter_json_strings(file, max(1, os.path.getsize(file_path))))
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return file.read()
+
+def process_file(file_path, filter_file=None, cache=None, prepared=None):
+    """Extract and analyze a file without writing anything. Returns the results dict or None.
+
+    With a ResultCache, files whose content was seen before skip OCR and
+    analysis entirely and reuse the cached results. `prepared` is passed on to `extract_text`.
+    """
+    if not is_supported(file_path):
+        logging.error(f"Unsupported file type: {file_path}. Supported types are image files, JSON files, and text files.")
+        return None
+
+    if should_stream(file_path):
+        return process_stream(file_path, filter_file, cache)
+
+    metrics = get_metrics()
+    extracted_text = None
+    if cache is not None:
+        with metrics.timer('cache_lookup'):
+            text_key = cache.text_key(hash_file(file_path), extraction_config(file_path))
+            extracted_text = cache.get('text', text_key)
+        metrics.incr('cache.text.miss' if extracted_text is None else 'cache.text.hit')
+
+    if extracted_text is None:
+        extracted_text = extract_text(file_path, prepared=prepared)
+        if extracted_text is None:
+            return None
+        if cache is not None:
+            cache.put('text', text_key, extracted_text)
+    else:
+        logging.info(f"Using cached text for {file_path}")
+
+    analysis = get_analysis(filter_file)  # Warm analyzer shared across files
+    analysis_results = None
+    if cache is not None:
+        with metrics.timer('cache_lookup'):
+            analysis_key = cache.analysis_key(extracted_text, filter_file, analysis.profile)
+            analysis_results = cache.get('analysis', analysis_key)
+        metrics.incr('cache.analysis.miss' if analysis_results is None else 'cache.analysis.hit')
+
+    if analysis_results is None:
+        # Perform text analysis on the extracted or read text
+        with metrics.timer('analyze'):
+            analysis_results = analysis.analyze_text(extracted_text)
+        if cache is not None:
+            cache.put('analysis', analysis_key, analysis_results)
+    else:
+        logging.info(f"Using cached analysis for {file_path}")
+
+    if ngram_stats.collecting():
+        _collect_ngrams(analysis, extracted_text)
+
+    return {
+        'extracted_text': extracted_text,
+        'analysis_results': analysis_results
+    }
+
+def _collect_ngrams(analysis, text):
+    """Count the document's n-grams for corpus statistics, reusing its tokens when just analyzed."""
+    doc = analysis.analyzer.doc
+    if doc is None or doc.text is not text:
+        doc = analysis.analyzer.load_text(text)
+    with get_metrics().timer('ngram_count'):
+        ngram_stats.collect_tokens(doc.tokens)
+
+def should_stream(file_path):
+    """Check whether a text or JSON file is large enough to be analyzed in chunks."""
+    return (STREAMING_THRESHOLD > 0 and file_path.lower().endswith(TEXT_EXTENSIONS)
+            and os.path.getsize(file_path) > STREAMING_THRESHOLD)
+
+def process_stream(file_path, filter_file=None, cache=None):
+    """Analyze a large text or JSON file with bounded memory.
+
+    Only analysis results are cached for streamed files, keyed on the file
+    contents, since their full text is never held in memory.
+    """
+    analysis = get_analysis(filter_file)
+    results = None
+    if cache is not None:
+        stream_key = cache.stream_key(hash_file(file_path), extraction_config(file_path), filter_file,
+                                      analysis.profile)
+        results = cache.get('analysis', stream_key)
+        get_metrics().incr('cache.analysis.miss' if results is None else 'cache.analysis.hit')
+    if results is None:
+        with get_metrics().timer('analyze_stream'):
+            results = analyze_stream(file_path, analysis)
+        if cache is not None:
+            cache.put('analysis', stream_key, results)
+    else:
+        logging.info(f"Using cached analysis for {file_path}")
+    return results
+
+def output_name(file_path):
+    """Name results after the file plus a short hash of its full path.
+
+    Files are tracked by full path, so `in/a.txt` and `in/sub/a.txt` are both
+    processed; the hash keeps their results from overwriting each other.
+    """
+    path_hash = hashlib.sha256(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:8]
+    return f"{os.path.basename(file_path)}_{path_hash}"
+
+def save_results(results, file_name, output_dir):
+    """Save analysis results to `<file_name>_analysis.json` in the output directory."""
+    output_file = os.path.join(output_dir, f"{file_name}_analysis.json")
+    os.makedirs(output_dir, exist_ok=True)  # Ensure output directory exists
+
+    # Debugging log
+    logging.info(f"Saving results to: {output_file}")
+
+    with open(output_file, 'w', encoding='utf-8') as json_file:
+        json.dump(results, json_file, indent=4)
+
+    logging.info(f"Results saved to {output_file}")
+    return output_file
+
+def analyze_and_save(file_path, output_dir, log_file, filter_file=None, cache=None, writer=None, prepared=None):
+    """Analyze a file and save the extracted text and analysis results to a JSON file in the specified output directory.
+
+    A writer from `output_writer` can be passed to store results in another layout,
+    and `prepared` is passed on to `process_file`.
+    """
+    metrics = get_metrics()
     try:
-        file_name = os.path.basename(file_path)
+        file_name = output_name(file_path)
+        ledger = open_ledger(log_file)
 
         # Skip if file has already been processed
-        if file_name in load_processed_files(log_file):
-            logging.info(f"Skipping already processed file: {file_name}")
+        if ledger.is_processed(file_path):
+            metrics.incr('ledger.hit')
+            logging.info(f"Skipping already processed file: {file_path}")
             return
+        metrics.incr('ledger.miss')
 
-        extracted_text = ""
-        analysis_results = {}
-
-        if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.tiff', '.bmp', '.gif')):
-            # Extract text from image
-            extractor = TextExtractor()
-            results = extractor.process_image(file_path)
-            
-            if not results:
-                logging.error(f"No text extracted from image {file_path}.")
-                return
-            
-            # Combine extracted text from all areas
-            extracted_text = "\n".join([res['text'] for res in results])
-            logging.info(f"Extracted text from image {file_path}: '{extracted_text}'")
-
-        elif file_path.lower().endswith(('.json', '.txt')):
-            # Read text from file
-            if file_path.lower().endswith('.json'):
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    data = json.load(file)
-                    extracted_text = json.dumps(data)  # Convert JSON to string
-            elif file_path.lower().endswith('.txt'):
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    extracted_text = file.read()
-
-        else:
-            logging.error(f"Unsupported file type: {file_path}. Supported types are image files, JSON files, and text files.")
+        results = process_file(file_path, filter_file, cache, prepared)
+        if results is None:
+            metrics.incr('files.empty')
             return
 
-        # Perform text analysis on the extracted or read text
-        analysis = TextAnalysis(filter_file=filter_file)  # Pass filter file path
-        analysis_results = analysis.analyze_text(extracted_text)
-
-        # Prepare results for saving
-        results = {
-            'extracted_text': extracted_text,
-            'analysis_results': analysis_results
-        }
-
-        # Save results to JSON file
-        output_file = os.path.join(output_dir, f"{file_name}_analysis.json")
-        os.makedirs(output_dir, exist_ok=True)  # Ensure output directory exists
-        
-        # Debugging log
-        logging.info(f"Saving results to: {output_file}")
-
-        with open(output_file, 'w', encoding='utf-8') as json_file:
-            json.dump(results, json_file, indent=4)
-        
-        logging.info(f"Results saved to {output_file}")
-
-        # Update processed files log
-        save_processed_file(file_name, log_file)
+        with metrics.timer('output_write'):
+            if writer is not None:
+                writer.write(file_path, results)
+            else:
+                save_results(results, file_name, output_dir)
+
+        # Update processed files ledger
+        ledger.mark_processed(file_path)
+        metrics.incr('files.processed')
 
     except Exception as e:
+        metrics.incr('files.failed')
         logging.error(f"Error processing file {file_path}: {e}")
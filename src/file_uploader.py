@@ -1,55 +1,78 @@
 import os
 import logging
 from file_processor import analyze_and_save
+from ledger import open_ledger, close_ledgers
+from scanner import DirectoryScanner, parse_patterns
+import analyzer_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def process_files(source_dir, exclude_files=None, output_dir=None):
-    """Process files from the source directory and its subdirectories based on exclusion criteria."""
+def process_files(source_dir, exclude_files=None, output_dir=None, log_file='processed_files.json', include=None,
+                  exclude=None, watch_interval=0, watch_batch_size=100):
+    """Process new or changed files from the source directory and its subdirectories based on exclusion criteria.
+
+    `exclude_files` lists file names to skip; `include` and `exclude` are glob patterns.
+    With `watch_interval` > 0, keep watching the directory for new files.
+    """
     try:
         # Check if source directory exists
         if not os.path.exists(source_dir):
             logging.error(f"Source directory '{source_dir}' does not exist.")
             return
 
-        # Walk through all directories and files
-        for root, dirs, files in os.walk(source_dir):
-            logging.info(f"Scanning directory: {root}")
-            for dir in dirs:
-                # Recursively process subdirectories
-                sub_dir = os.path.join(root, dir)
-                process_files(sub_dir, exclude_files, output_dir)
-
-            for file_name in files:
-                source_file = os.path.join(root, file_name)
-                
-                # Check if file is in the exclusion list
-                if exclude_files and file_name in exclude_files:
-                    logging.info(f"Skipping excluded file '{file_name}'.")
-                    continue
+        exclude = list(exclude or []) + list(exclude_files or [])
+        ledger = open_ledger(log_file)
+        scanner = DirectoryScanner(source_dir, include, exclude, snapshot=ledger)
+        if watch_interval > 0:
+            batches = scanner.watch(watch_interval, watch_batch_size)
+        else:
+            batches = [scanner.files()]
 
+        # Each file is visited once; the walk already descends into subdirectories
+        for batch in batches:
+            for source_file in batch:
                 # Process the file
                 logging.info(f"Processing file: {source_file}")
                 if output_dir:
-                    analyze_and_save(source_file, output_dir)
+                    try:
+                        analyze_and_save(source_file, output_dir, log_file)
+                    except Exception as e:
+                        logging.error(f"Error processing file {source_file}: {e}")
+            ledger.commit()
+        logging.info(f"Scan summary: {scanner.stats}")
 
+    except KeyboardInterrupt:
+        logging.info("Stopped watching for new files.")
     except Exception as e:
         logging.error(f"Error processing files: {e}")
+    finally:
+        close_ledgers()
 
 def main():
     # Retrieve source directory and output directory from environment variables or set default values
     source_directory = os.getenv('SOURCE_DIRECTORY', 'C:/path/to/source')
     output_directory = os.getenv('OUTPUT_DIRECTORY', 'C:/path/to/output')
+    processed_files_log = os.getenv('PROCESSED_FILES_LOG', 'processed_files.json')
+    scan_include = parse_patterns(os.getenv('SCAN_INCLUDE'))
+    scan_exclude = parse_patterns(os.getenv('SCAN_EXCLUDE'))
+    watch_interval = float(os.getenv('WATCH_INTERVAL', '0'))
+    watch_batch_size = int(os.getenv('WATCH_BATCH_SIZE', '100'))
 
     logging.info(f"Source directory: {source_directory}")
     logging.info(f"Output directory: {output_directory}")
+    logging.info(f"Processed files log: {processed_files_log}")
 
     # Optional: Define files to exclude
     exclude_files = []  # List of files to exclude, or leave empty to process all files
 
-    # Run the file processing function
-    process_files(source_directory, exclude_files, output_directory)
+    # Load the NLP libraries once, then run the file processing function
+    analyzer_pool.warm_up()
+    try:
+        process_files(source_directory, exclude_files, output_directory, processed_files_log, scan_include,
+                      scan_exclude, watch_interval, watch_batch_size)
+    finally:
+        analyzer_pool.teardown()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,228 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import Counter
+
+# Bump when the automaton layout or lexicon parsing changes to invalidate cached matchers
+MATCHER_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'textprocessor-filter-matchers')
+
+
+def parse_lexicon(lines):
+    """Parse filter-lexicon lines into `{term: weight}`.
+
+    Each non-empty line is a lowercased term, optionally followed by a tab and a
+    numeric weight (default 1.0). Terms may contain several words separated by
+    whitespace; they then match that sequence of tokens.
+    """
+    terms = {}
+    for line in lines:
+        line = line.strip().lower()
+        if not line:
+            continue
+        term, weight = line, 1.0
+        if '\t' in line:
+            head, _, tail = line.rpartition('\t')
+            try:
+                term, weight = head.strip(), float(tail)
+            except ValueError:
+                pass
+        if term:
+            terms[term] = weight
+    return terms
+
+
+class FilterMatches(list):
+    """Matched filter terms in text order, with their total weight."""
+
+    def __init__(self, terms=(), weight=None):
+        super().__init__(terms)
+        self.weight = float(len(self)) if weight is None else weight
+
+    def counts(self):
+        """Hits per term."""
+        return dict(Counter(self))
+
+
+class FilterMatcher:
+    """Aho-Corasick automaton over token sequences for a filter lexicon.
+
+    Single-word terms match a token exactly, like the previous set lookup;
+    multi-word terms match consecutive tokens. `match` scans the tokens once and
+    keeps leftmost-longest, non-overlapping matches, so "not good" is reported
+    instead of "good" when both are in the lexicon.
+    """
+
+    def __init__(self, terms=None):
+        terms = terms or {}
+        self.terms = list(terms)
+        self.weights = [float(terms[term]) for term in self.terms]
+        self._index = {term: i for i, term in enumerate(self.terms)}
+        self._build()
+
+    @classmethod
+    def from_words(cls, words):
+        """Compile an iterable of terms (or a `{term: weight}` mapping)."""
+        if isinstance(words, dict):
+            return cls({' '.join(term.lower().split()): weight for term, weight in words.items() if term.strip()})
+        return cls(parse_lexicon(words))
+
+    def _build(self):
+        # goto[node] maps a token to the child node; term_at[node] is the term ending there (-1 if none)
+        self._goto = [{}]
+        self._term_at = [-1]
+        self._lengths = []
+        for i, term in enumerate(self.terms):
+            tokens = term.split()
+            self._lengths.append(len(tokens))
+            node = 0
+            for token in tokens:
+                child = self._goto[node].get(token)
+                if child is None:
+                    child = self._goto[node][token] = len(self._goto)
+                    self._goto.append({})
+                    self._term_at.append(-1)
+                node = child
+            self._term_at[node] = i
+        self._link()
+
+    def _link(self):
+        """Compute failure links and output links breadth-first."""
+        size = len(self._goto)
+        self._fail = [0] * size
+        # out[node] is the nearest node on the failure chain (excluding node) that ends a term
+        self._out = [-1] * size
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for token, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(token, 0)
+                self._fail[child] = fail
+                self._out[child] = fail if self._term_at[fail] >= 0 else self._out[fail]
+                queue.append(child)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def __contains__(self, term):
+        return term in self._index
+
+    def weight(self, term):
+        return self.weights[self._index[term]]
+
+    def match(self, tokens):
+        """Return the leftmost-longest non-overlapping matches in `tokens`."""
+        goto, fail, term_at, out, lengths = self._goto, self._fail, self._term_at, self._out, self._lengths
+        found = []
+        node = 0
+        for end, token in enumerate(tokens):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            hit = node if term_at[node] >= 0 else out[node]
+            while hit > 0:
+                term = term_at[hit]
+                found.append((end - lengths[term] + 1, -lengths[term], term))
+                hit = out[hit]
+        if not found:
+            return FilterMatches()
+        found.sort()
+        terms = []
+        weight = 0.0
+        last_end = -1
+        for start, neg_length, term in found:
+            if start > last_end:
+                terms.append(self.terms[term])
+                weight += self.weights[term]
+                last_end = start - neg_length - 1
+        return FilterMatches(terms, weight)
+
+    def to_dict(self):
+        return {
+            'version': MATCHER_VERSION,
+            'terms': self.terms,
+            'weights': self.weights,
+            'lengths': self._lengths,
+            'goto': self._goto,
+            'term_at': self._term_at,
+            'fail': self._fail,
+            'out': self._out,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        matcher = cls.__new__(cls)
+        matcher.terms = data['terms']
+        matcher.weights = data['weights']
+        matcher._index = {term: i for i, term in enumerate(matcher.terms)}
+        matcher._lengths = data['lengths']
+        matcher._goto = data['goto']
+        matcher._term_at = data['term_at']
+        matcher._fail = data['fail']
+        matcher._out = data['out']
+        return matcher
+
+
+def lexicon_hash(data):
+    """SHA-256 of the lexicon bytes plus the matcher version."""
+    return hashlib.sha256(f"v{MATCHER_VERSION}:".encode('ascii') + data).hexdigest()
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def load_matcher(filter_file, cache_dir=None):
+    """Compile the filter lexicon in `filter_file`, reusing a compiled copy when possible.
+
+    Matchers are shared in-process by lexicon hash and stored as JSON in
+    `cache_dir` (FILTER_MATCHER_CACHE_DIR, default a temp folder; empty disables).
+    An unreadable lexicon yields an empty matcher.
+    """
+    try:
+        with open(filter_file, 'rb') as file:
+            data = file.read()
+    except OSError as e:
+        logging.error(f"Error loading filter words from {filter_file}: {e}")
+        return FilterMatcher()
+    digest = lexicon_hash(data)
+    with _matchers_lock:
+        matcher = _matchers.get(digest)
+        if matcher is not None:
+            return matcher
+        if cache_dir is None:
+            cache_dir = os.getenv('FILTER_MATCHER_CACHE_DIR', DEFAULT_CACHE_DIR)
+        cache_file = os.path.join(cache_dir, f"{digest}.json") if cache_dir else None
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as file:
+                    matcher = FilterMatcher.from_dict(json.load(file))
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Ignoring unreadable filter matcher cache '{cache_file}': {e}")
+        if matcher is None:
+            matcher = FilterMatcher(parse_lexicon(data.decode('utf-8', errors='replace').splitlines()))
+            logging.info(f"Compiled filter matcher with {len(matcher)} terms from {filter_file}")
+            if cache_file:
+                _write_cache(cache_file, matcher)
+        _matchers[digest] = matcher
+        return matcher
+
+
+def _write_cache(cache_file, matcher):
+    temp_path = f"{cache_file}.{os.getpid()}.part"
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(matcher.to_dict(), file)
+        os.replace(temp_path, cache_file)
+    except OSError as e:
+        logging.warning(f"Could not write filter matcher cache '{cache_file}': {e}")
@@ -0,0 +1,204 @@
+import os
+import time
+import logging
+import threading
+from collections import namedtuple, deque
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from metrics import get_metrics
+
+# 'legacy' is the original color pipeline at a fixed 800 px; 'fast' is ImagePreprocessor
+PREPROCESS_ENGINES = ('legacy', 'fast')
+DEFAULT_PREPROCESS_ENGINE = os.getenv('PREPROCESS_ENGINE', 'legacy')
+
+# The blur, threshold block and closing kernel sizes were tuned on images scaled to 800 px
+REFERENCE_SIDE = 800
+
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+# libjpeg can decode directly at 1/2, 1/4 or 1/8 size
+_REDUCED_GRAYSCALE = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                      (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+
+# `seconds` is the time spent decoding and preprocessing, reported with the OCR stage timings
+PreprocessedImage = namedtuple('PreprocessedImage', ['gray', 'binary', 'seconds'])
+
+
+class ImagePreprocessor:
+    """Grayscale, downscale-only preprocessing for OCR.
+
+    Images are decoded straight to grayscale (large JPEGs at a reduced size,
+    uncompressed TIFFs through a memory map) and only shrunk when their longer
+    side exceeds `max_side` by more than `min_downscale`; smaller images keep
+    their native resolution. Blur, threshold and closing sizes grow with the
+    image relative to the 800 px the original pipeline was tuned on, and the
+    structuring kernels for each size are built once. `prepare_batch` runs
+    images through these steps on a thread pool, since OpenCV releases the GIL.
+    """
+
+    def __init__(self, max_side=2000, min_downscale=1.25, threads=None, memmap_tiff=True):
+        self.max_side = max_side
+        self.min_downscale = min_downscale
+        self.threads = threads or min(4, os.cpu_count() or 1)
+        self.memmap_tiff = memmap_tiff
+        self._executor = None
+        self._lock = threading.Lock()
+        # (blur size, threshold block size, closing kernel) per integer scale factor
+        self._params = {factor: self._build_params(factor) for factor in range(1, self._factor(max_side) + 1)}
+
+    @staticmethod
+    def _factor(side):
+        return max(1, round(side / REFERENCE_SIDE))
+
+    @staticmethod
+    def _build_params(factor):
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2 * factor + 1, 2 * factor + 1))
+        return 4 * factor + 1, 10 * factor + 1, kernel
+
+    def config(self):
+        """Settings that affect the preprocessed image, used to key cached results."""
+        return {'engine': 'fast', 'max_side': self.max_side, 'min_downscale': self.min_downscale,
+                'memmap_tiff': self.memmap_tiff}
+
+    def _reduced_flag(self, file_path):
+        """Grayscale decode flag that lets libjpeg skip resolution the downscale would discard."""
+        from PIL import Image
+        try:
+            with Image.open(file_path) as image:
+                longest = max(image.size)
+        except OSError:
+            return cv2.IMREAD_GRAYSCALE
+        for reduction, flag in _REDUCED_GRAYSCALE:
+            if longest / reduction >= self.max_side:
+                return flag
+        return cv2.IMREAD_GRAYSCALE
+
+    def _map_tiff(self, file_path):
+        """Memory-map the first page of an uncompressed TIFF, or None when it cannot be mapped."""
+        try:
+            import tifffile
+        except ImportError:
+            return None
+        try:
+            image = tifffile.memmap(file_path, mode='r')
+        except (ValueError, OSError):
+            # Compressed, tiled or bilevel TIFFs are decoded normally
+            return None
+        if image.ndim == 4 or (image.ndim == 3 and image.shape[-1] not in (3, 4)):
+            image = image[0]
+        return image
+
+    def load(self, file_path):
+        """Decode an image, in grayscale where the decoder supports it. Returns None if unreadable."""
+        lower = file_path.lower()
+        if self.memmap_tiff and lower.endswith(TIFF_EXTENSIONS):
+            image = self._map_tiff(file_path)
+            if image is not None:
+                return image
+        flags = self._reduced_flag(file_path) if lower.endswith(JPEG_EXTENSIONS) else cv2.IMREAD_GRAYSCALE
+        return cv2.imread(file_path, flags)
+
+    def downscale(self, image):
+        """Shrink an image whose longer side is well above `max_side`; never upscale."""
+        longest = max(image.shape[:2])
+        if longest <= self.max_side * self.min_downscale:
+            return image
+        scale = self.max_side / longest
+        height, width = image.shape[:2]
+        return cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                          interpolation=cv2.INTER_AREA)
+
+    @staticmethod
+    def to_gray(image):
+        """8-bit single-channel version of a decoded (possibly memory-mapped) image."""
+        if image.ndim == 3:
+            code = cv2.COLOR_RGBA2GRAY if image.shape[-1] == 4 else cv2.COLOR_RGB2GRAY
+            image = cv2.cvtColor(image, code)
+        if image.dtype == 'uint16':
+            image = cv2.convertScaleAbs(image, alpha=1 / 257)
+        elif image.dtype != 'uint8':
+            image = cv2.normalize(image, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+        return image
+
+    def load_scaled(self, file_path):
+        """Decode, downscale and convert to 8-bit grayscale. Returns None if unreadable."""
+        metrics = get_metrics()
+        with metrics.timer('read'):
+            image = self.load(file_path)
+        if image is None:
+            return None
+        # Shrink before the color conversion so memory-mapped TIFFs are never copied at full size
+        with metrics.timer('resize'):
+            image = self.downscale(image)
+        return self.to_gray(image)
+
+    def binarize(self, gray):
+        """Blur, adaptive threshold and close gaps, with sizes matched to the image resolution."""
+        factor = min(self._factor(max(gray.shape[:2])), max(self._params))
+        blur, block, kernel = self._params[factor]
+        with get_metrics().timer('preprocess'):
+            blurred = cv2.GaussianBlur(gray, (blur, blur), 0)
+            thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV,
+                                           block, 2)
+            return cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
+
+    def prepare(self, file_path):
+        """Return a PreprocessedImage(gray, binary, seconds) for a file, or None if it cannot be read."""
+        started = time.perf_counter()
+        gray = self.load_scaled(file_path)
+        if gray is None:
+            return None
+        return PreprocessedImage(gray, self.binarize(gray), time.perf_counter() - started)
+
+    def _prepare_safely(self, file_path):
+        try:
+            return self.prepare(file_path)
+        except Exception as e:
+            logging.error(f"Error preprocessing image {file_path}: {e}")
+            return None
+
+    def prepare_batch(self, file_paths, lookahead=None):
+        """Preprocess images on the thread pool; yields a PreprocessedImage (or None) per path, in order.
+
+        Results are yielded as soon as each is ready, so OCR of the first image
+        overlaps with preprocessing of the rest. At most `lookahead` images
+        (default: twice the thread count) are prepared ahead of the consumer,
+        which keeps memory bounded for long batches.
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='preprocess')
+        lookahead = lookahead or self.threads * 2
+        queued = deque()
+        for file_path in file_paths:
+            if len(queued) >= lookahead:
+                yield queued.popleft().result()
+            queued.append(self._executor.submit(self._prepare_safely, file_path))
+        while queued:
+            yield queued.popleft().result()
+
+    def close(self):
+        """Shut down the thread pool."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+_preprocessor = None
+_preprocessor_lock = threading.Lock()
+
+
+def get_preprocessor():
+    """Return the process-wide ImagePreprocessor, configured from PREPROCESS_* variables."""
+    global _preprocessor
+    with _preprocessor_lock:
+        if _preprocessor is None:
+            _preprocessor = ImagePreprocessor(
+                max_side=int(os.getenv('PREPROCESS_MAX_SIDE', '2000')),
+                min_downscale=float(os.getenv('PREPROCESS_MIN_DOWNSCALE', '1.25')),
+                threads=int(os.getenv('PREPROCESS_THREADS', '0')) or None,
+                memmap_tiff=os.getenv('PREPROCESS_MEMMAP_TIFF', '1') == '1',
+            )
+        return _preprocessor
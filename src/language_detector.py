@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+UNKNOWN_LANGUAGE = 'unknown'
+
+# langdetect's smoothing: each n-gram adds alpha / BASE_FREQ to every language's probability
+_ALPHA = 0.5
+_BASE_FREQ = 10000
+
+
+def sample_text(text, sample_chars=2000, windows=4):
+    """Up to `sample_chars` characters from `windows` evenly spread parts of the text, cut at spaces."""
+    if len(text) <= sample_chars:
+        return text
+    size = sample_chars // windows
+    step = (len(text) - size) / (windows - 1) if windows > 1 else 0
+    parts = []
+    for i in range(windows):
+        start = int(i * step)
+        part = text[start:start + size]
+        # Drop partial words at the cut edges
+        if start > 0 and ' ' in part:
+            part = part[part.index(' ') + 1:]
+        if start + size < len(text) and ' ' in part:
+            part = part[:part.rindex(' ')]
+        parts.append(part)
+    return ' '.join(parts)
+
+
+class LanguageDetector:
+    """Deterministic language detection with langdetect's character n-gram profiles.
+
+    The profiles are loaded once into a NumPy matrix of smoothed log
+    probabilities (n-gram x language). A text is reduced to a bounded sample,
+    and the language with the highest summed log probability over the sample's
+    1-3-gram features is returned, so cost stays flat for any document size and
+    the same text always gets the same answer. Texts with fewer than
+    `min_chars` letters or `min_features` known n-grams are 'unknown'. Results
+    are cached by a hash of the sample.
+    """
+
+    def __init__(self, sample_chars=2000, windows=4, min_chars=20, min_features=10, cache_size=10000):
+        import numpy as np
+        from langdetect.detector_factory import DetectorFactory, PROFILES_DIRECTORY
+        self._np = np
+        self._factory = DetectorFactory()
+        self._factory.load_profile(PROFILES_DIRECTORY)
+        self.languages = list(self._factory.langlist)
+        prob_map = self._factory.word_lang_prob_map
+        self._rows = {ngram: i for i, ngram in enumerate(prob_map)}
+        self._log_probs = np.log(np.array(list(prob_map.values()), dtype=np.float32) + _ALPHA / _BASE_FREQ)
+        self.sample_chars = sample_chars
+        self.windows = windows
+        self.min_chars = min_chars
+        self.min_features = min_features
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _features(self, sample):
+        """langdetect's n-gram features of a text (URLs and e-mails removed, whitespace collapsed)."""
+        detector = self._factory.create()
+        detector.set_max_text_length(len(sample))
+        detector.append(sample)
+        detector.cleaning_text()
+        return detector._extract_ngrams()
+
+    def _classify(self, sample):
+        if sum(ch.isalpha() for ch in sample) < self.min_chars:
+            return UNKNOWN_LANGUAGE
+        features = self._features(sample)
+        if len(features) < self.min_features:
+            return UNKNOWN_LANGUAGE
+        rows = [self._rows[ngram] for ngram in features]
+        scores = self._log_probs[rows].sum(axis=0, dtype=self._np.float64)
+        return self.languages[int(scores.argmax())]
+
+    def detect(self, text):
+        """Return the language code of `text`, or 'unknown'."""
+        sample = sample_text(text, self.sample_chars, self.windows)
+        key = hashlib.sha1(sample.encode('utf-8', errors='replace')).digest()
+        with self._lock:
+            language = self._cache.get(key)
+            if language is not None:
+                self._cache.move_to_end(key)
+                return language
+        language = self._classify(sample)
+        with self._lock:
+            self._cache[key] = language
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return language
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_language_detector():
+    """Return the process-wide LanguageDetector, loading the profiles on first use."""
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            _detector = LanguageDetector()
+            logging.info(f"Loaded language profiles for {len(_detector.languages)} languages")
+        return _detector
@@ -0,0 +1,205 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    content_hash TEXT,
+    processed_at REAL
+);
+CREATE TABLE IF NOT EXISTS legacy (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def ledger_path_for(log_file):
+    """Map a processed-files log path to its SQLite ledger path."""
+    if log_file.lower().endswith('.json'):
+        return os.path.splitext(log_file)[0] + '.sqlite3'
+    return log_file
+
+
+class ProcessedLedger:
+    """Indexed record of processed files backed by SQLite.
+
+    Files are keyed on their absolute path plus size and mtime (`key_mode='stat'`)
+    or plus a SHA-256 of the contents (`key_mode='hash'`). The whole index is held
+    in memory so membership checks are dict lookups; writes are committed in
+    batches of `commit_every`, or only on explicit `commit()` when it is 0.
+    """
+
+    def __init__(self, path, key_mode='stat', commit_every=100):
+        if key_mode not in ('stat', 'hash'):
+            raise ValueError(f"Unknown ledger key mode: {key_mode}")
+        self.path = path
+        self.key_mode = key_mode
+        self.commit_every = commit_every
+        self._lock = threading.RLock()
+        self._pending = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._index = {
+            row[0]: (row[1], row[2], row[3])
+            for row in self._conn.execute('SELECT path, size, mtime_ns, content_hash FROM processed')
+        }
+        self._legacy = {row[0] for row in self._conn.execute('SELECT name FROM legacy')}
+
+    def __len__(self):
+        return len(self._index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def migrate_json(self, json_file):
+        """Import basenames from a legacy `processed_files.json` once."""
+        marker = f"migrated:{os.path.abspath(json_file)}"
+        with self._lock:
+            if self._conn.execute('SELECT 1 FROM meta WHERE key = ?', (marker,)).fetchone():
+                return 0
+            names = []
+            if os.path.exists(json_file):
+                try:
+                    with open(json_file, 'r', encoding='utf-8') as file:
+                        names = [name for name in json.load(file) if isinstance(name, str)]
+                except (json.JSONDecodeError, OSError) as e:
+                    logging.error(f"Error reading legacy log file '{json_file}': {e}")
+                    return 0
+            self._conn.executemany('INSERT OR IGNORE INTO legacy (name) VALUES (?)', [(n,) for n in names])
+            self._conn.execute('INSERT INTO meta (key, value) VALUES (?, ?)', (marker, str(time.time())))
+            self._conn.commit()
+            self._legacy.update(names)
+        if names:
+            logging.info(f"Migrated {len(names)} entries from legacy log file '{json_file}'")
+        return len(names)
+
+    def _fingerprint(self, file_path, stat):
+        content_hash = hash_file(file_path) if self.key_mode == 'hash' else None
+        return (stat.st_size, stat.st_mtime_ns, content_hash)
+
+    def _matches(self, entry, file_path, stat):
+        size, mtime_ns, content_hash = entry
+        if size != stat.st_size:
+            return False
+        if self.key_mode == 'stat':
+            return mtime_ns == stat.st_mtime_ns
+        return content_hash == hash_file(file_path)
+
+    def is_processed(self, file_path):
+        """Check whether this exact file (path and contents) has been processed."""
+        path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        with self._lock:
+            entry = self._index.get(path)
+            if entry is not None:
+                return self._matches(entry, path, stat)
+            name = os.path.basename(path)
+            if name in self._legacy:
+                # Legacy entries only carry a basename; the first path that claims one takes it over
+                self._legacy.discard(name)
+                self._conn.execute('DELETE FROM legacy WHERE name = ?', (name,))
+                self._record(path, self._fingerprint(path, stat))
+                return True
+        return False
+
+    def is_unchanged(self, file_path, size, mtime_ns):
+        """Check a file's size and mtime (e.g. from a directory scan) against the ledger without touching the file."""
+        with self._lock:
+            entry = self._index.get(os.path.abspath(file_path))
+        return entry is not None and entry[0] == size and entry[1] == mtime_ns
+
+    def _record(self, path, fingerprint):
+        self._index[path] = fingerprint
+        self._conn.execute(
+            'INSERT OR REPLACE INTO processed (path, size, mtime_ns, content_hash, processed_at) VALUES (?, ?, ?, ?, ?)',
+            (path, *fingerprint, time.time()),
+        )
+        self._pending += 1
+        if self.commit_every and self._pending >= self.commit_every:
+            self.commit()
+
+    def mark_processed(self, file_path):
+        """Record a file as processed; committed with the next batch."""
+        path = os.path.abspath(file_path)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            logging.error(f"Error recording processed file '{file_path}': {e}")
+            return
+        with self._lock:
+            self._record(path, self._fingerprint(path, stat))
+
+    def commit(self):
+        """Flush pending writes to disk."""
+        with self._lock:
+            if self._pending:
+                self._conn.commit()
+                self._pending = 0
+
+    def close(self):
+        """Commit and close the database."""
+        with self._lock:
+            if self._conn is not None:
+                self.commit()
+                self._conn.close()
+                self._conn = None
+
+
+_ledgers = {}
+_ledgers_lock = threading.Lock()
+
+
+def open_ledger(log_file, key_mode=None):
+    """Return the shared ledger for a log file path, migrating a legacy JSON log on first open.
+
+    `log_file` may be the legacy `processed_files.json` path; the ledger is then
+    stored next to it as `processed_files.sqlite3`.
+    """
+    key_mode = key_mode or os.getenv('LEDGER_KEY_MODE', 'stat')
+    db_path = os.path.abspath(ledger_path_for(log_file))
+    with _ledgers_lock:
+        ledger = _ledgers.get(db_path)
+        if ledger is None:
+            ledger = _ledgers[db_path] = ProcessedLedger(db_path, key_mode=key_mode)
+            if log_file.lower().endswith('.json'):
+                ledger.migrate_json(log_file)
+        return ledger
+
+
+def close_ledgers():
+    """Commit and close every ledger opened through `open_ledger`."""
+    with _ledgers_lock:
+        for ledger in _ledgers.values():
+            ledger.close()
+        _ledgers.clear()
@@ -2,20 +2,27 @@ import os
 import datetime
 import uuid
 import logging
-from file_processor import analyze_and_save
+from file_processor import analyze_and_save, prefetch_images
+import analyzer_pool
+from batch_runner import BatchRunner
+from ledger import open_ledger, close_ledgers
+from result_cache import open_cache, close_caches
+from output_writer import open_writer
+from metrics import enable_metrics, get_metrics, SnapshotWriter
+from analysis_profiles import get_profile
+from filter_matcher import load_matcher
+from scanner import DirectoryScanner, parse_patterns
+import ngram_stats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def load_filtered_words(path):
-    """Load the filtered words from a text file."""
-    try:
-        with open(path, 'r', encoding='utf-8') as file:
-            words = {line.strip().lower() for line in file if line.strip()}
-        return words
-    except Exception as e:
-        logging.error(f"Error loading filtered words from '{path}': {e}")
-        return set()
+    """Load the filtered words from a text file as a compiled FilterMatcher.
+
+    The compiled matcher is cached on disk by lexicon hash, so worker processes reuse it.
+    """
+    return load_matcher(path)
 
 def main():
     """Main function to process files and save results."""
@@ -24,12 +31,37 @@ def main():
     output_directory = os.getenv('OUTPUT_DIRECTORY', 'C:/path/to/output/directory')
     processed_files_log = os.getenv('PROCESSED_FILES_LOG', 'processed_files.json')
     filtered_words_path = os.getenv('FILTERED_WORDS_PATH', 'C:/Users/brand/Downloads/negative-words.txt')
+    parallel_workers = int(os.getenv('PARALLEL_WORKERS', '1'))
+    max_in_flight = int(os.getenv('MAX_IN_FLIGHT', '0')) or None
+    file_timeout = float(os.getenv('FILE_TIMEOUT', '0')) or None
+    result_cache_path = os.getenv('RESULT_CACHE_PATH', os.path.join(output_directory, 'result_cache.sqlite3'))
+    result_cache_max_mb = int(os.getenv('RESULT_CACHE_MAX_MB', '512'))
+    output_format = os.getenv('OUTPUT_FORMAT', 'json')
+    output_compress = os.getenv('OUTPUT_COMPRESS', '1') == '1'
+    output_flush_every = int(os.getenv('OUTPUT_FLUSH_EVERY', '1000'))
+    output_text_by_reference = os.getenv('OUTPUT_TEXT_BY_REFERENCE', '0') == '1'
+    collect_metrics = os.getenv('METRICS', '0') == '1'
+    metrics_interval = float(os.getenv('METRICS_INTERVAL', '0'))
+    scan_include = parse_patterns(os.getenv('SCAN_INCLUDE'))
+    scan_exclude = parse_patterns(os.getenv('SCAN_EXCLUDE'))
+    watch_interval = float(os.getenv('WATCH_INTERVAL', '0'))
+    watch_batch_size = int(os.getenv('WATCH_BATCH_SIZE', '100'))
+    corpus_stats = ngram_stats.stats_from_env()
+    ngram_top = int(os.getenv('NGRAM_STATS_TOP', '20'))
 
     # Log retrieved paths
     logging.info(f"File directory: {file_directory}")
     logging.info(f"Output directory: {output_directory}")
     logging.info(f"Processed files log: {processed_files_log}")
     logging.info(f"Filtered words path: {filtered_words_path}")
+    logging.info(f"Parallel workers: {parallel_workers}")
+    logging.info(f"Result cache: {result_cache_path or 'disabled'}")
+    logging.info(f"Output format: {output_format}")
+    if watch_interval > 0:
+        logging.info(f"Watching for new files every {watch_interval}s")
+    logging.info(f"Analysis profile: {get_profile().name}")
+    if corpus_stats is not None:
+        logging.info(f"N-gram statistics: {corpus_stats.mode}")
 
     if not os.path.exists(file_directory):
         logging.error(f"Directory '{file_directory}' does not exist.")
@@ -55,18 +87,102 @@ def main():
     os.makedirs(unique_output_dir, exist_ok=True)
     logging.info(f"Results will be saved in folder: {unique_output_dir}")
 
-    # Process files in the source directory and its subdirectories
-    for root, dirs, files in os.walk(file_directory):
-        logging.info(f"Scanning directory: {root}")
-        for file_name in files:
-            source_file = os.path.join(root, file_name)
-
-            # Log the file being processed
-            logging.info(f"Processing file: {source_file}")
-            try:
-                analyze_and_save(source_file, unique_output_dir, processed_files_log, filter_file=filtered_words_path)
-            except Exception as e:
-                logging.error(f"Error processing file {source_file}: {e}")
+    writer_options = {}
+    if output_format == 'jsonl':
+        writer_options = {'compress': output_compress, 'flush_every': output_flush_every,
+                          'text_by_reference': output_text_by_reference}
+    writer = open_writer(unique_output_dir, output_format, **writer_options)
+
+    snapshot_writer = None
+    if collect_metrics:
+        enable_metrics()
+        if metrics_interval > 0:
+            snapshot_writer = SnapshotWriter(get_metrics(), os.path.join(unique_output_dir, 'metrics_live.json'),
+                                             metrics_interval).start()
+
+    try:
+        process_directory(file_directory, unique_output_dir, processed_files_log, filtered_words_path, filtered_words,
+                          writer, parallel_workers, max_in_flight, file_timeout, result_cache_path,
+                          result_cache_max_mb * 1024 * 1024, scan_include, scan_exclude, watch_interval,
+                          watch_batch_size, corpus_stats)
+    finally:
+        if corpus_stats is not None:
+            ngram_stats.save_run_stats(corpus_stats, unique_output_dir, ngram_top)
+        if snapshot_writer is not None:
+            snapshot_writer.stop()
+        if collect_metrics:
+            metrics_file = get_metrics().write(os.path.join(unique_output_dir, 'metrics.json'))
+            logging.info(f"Run metrics saved to {metrics_file}")
+
+def process_directory(file_directory, unique_output_dir, processed_files_log, filtered_words_path, filtered_words,
+                      writer, parallel_workers, max_in_flight, file_timeout, result_cache_path, result_cache_max_bytes,
+                      include=None, exclude=None, watch_interval=0, watch_batch_size=100, corpus_stats=None):
+    """Process new or changed files under `file_directory` into the run folder.
+
+    With `watch_interval` > 0, keep rescanning and process newly arriving files in batches.
+    With `corpus_stats` (an NgramStats), every analyzed document's n-grams are counted into it.
+    """
+    # The processed-files ledger doubles as the scan snapshot, so unchanged files are skipped during the scan
+    scanner = DirectoryScanner(file_directory, include, exclude, snapshot=open_ledger(processed_files_log))
+    watch = watch_interval > 0
+    if watch:
+        batches = scanner.watch(watch_interval, watch_batch_size)
+    else:
+        batches = [scanner.files()]
+
+    if parallel_workers > 1:
+        # Workers load their own models; this process only owns the ledger and output writes
+        runner = BatchRunner(unique_output_dir, processed_files_log, filtered_words_path, parallel_workers,
+                             max_in_flight, file_timeout, result_cache_path or None, result_cache_max_bytes, writer,
+                             corpus_stats)
+        try:
+            for batch in batches:
+                runner.run(batch, keep_alive=watch)
+        except KeyboardInterrupt:
+            logging.info("Stopped watching for new files.")
+        finally:
+            logging.info(f"Scan summary: {scanner.stats}")
+            runner.close()
+            writer.close()
+            close_ledgers()
+            if result_cache_path:
+                # Apply the size limit once the workers are done writing
+                open_cache(result_cache_path, result_cache_max_bytes)
+                close_caches()
+        return
+
+    # Load the filter matcher and NLP libraries once for the whole run
+    analyzer_pool.warm_up(filter_file=filtered_words_path, filter_words=filtered_words)
+    cache = open_cache(result_cache_path, result_cache_max_bytes) if result_cache_path else None
+    writer.bind_ledger(open_ledger(processed_files_log))
+    if corpus_stats is not None:
+        ngram_stats.enable_collection()
+
+    try:
+        # Process new or changed files in the source directory and its subdirectories
+        for batch in batches:
+            # With the fast preprocess engine, upcoming images are prepared while the current file is OCR'd
+            for source_file, prepared in prefetch_images(batch):
+                # Log the file being processed
+                logging.info(f"Processing file: {source_file}")
+                try:
+                    analyze_and_save(source_file, unique_output_dir, processed_files_log, filter_file=filtered_words_path, cache=cache, writer=writer, prepared=prepared)
+                except Exception as e:
+                    logging.error(f"Error processing file {source_file}: {e}")
+                counts = ngram_stats.drain_collected()
+                if counts and corpus_stats is not None:
+                    corpus_stats.add_counts(counts)
+            if watch:
+                writer.flush()
+                scanner.snapshot.commit()
+    except KeyboardInterrupt:
+        logging.info("Stopped watching for new files.")
+    finally:
+        logging.info(f"Scan summary: {scanner.stats}")
+        writer.close()
+        close_ledgers()
+        close_caches()
+        analyzer_pool.teardown()
 
 if __name__ == "__main__":
     main()
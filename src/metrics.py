@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import logging
+import threading
+
+
+class _Timer:
+    __slots__ = ('metrics', 'stage', 'start')
+
+    def __init__(self, metrics, stage):
+        self.metrics = metrics
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+# Counter pairs reported as hit rates in snapshots
+HIT_RATES = {
+    'cache.text': ('cache.text.hit', 'cache.text.miss'),
+    'cache.analysis': ('cache.analysis.hit', 'cache.analysis.miss'),
+    'phash': ('phash.hit', 'phash.miss'),
+    'ledger': ('ledger.hit', 'ledger.miss'),
+}
+
+
+class Metrics:
+    """Thread-safe stage timers and counters for a run."""
+
+    enabled = True
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._counters = {}
+        self.started = time.time()
+
+    def timer(self, stage):
+        """Context manager that records the time spent in `stage`."""
+        return _Timer(self, stage)
+
+    def record(self, stage, seconds, count=1):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                self._stages[stage] = [count, seconds, seconds]
+            else:
+                entry[0] += count
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def drain(self):
+        """Return the raw stage and counter data and reset them (used to ship worker metrics)."""
+        with self._lock:
+            data = {'stages': self._stages, 'counters': self._counters}
+            self._stages = {}
+            self._counters = {}
+        return data
+
+    def merge(self, data):
+        """Add raw data returned by `drain` in another process."""
+        if not data:
+            return
+        with self._lock:
+            for stage, (count, total, maximum) in data['stages'].items():
+                entry = self._stages.setdefault(stage, [0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += total
+                entry[2] = max(entry[2], maximum)
+            for name, value in data['counters'].items():
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self):
+        """Summary of stage timings, counters and hit rates so far."""
+        with self._lock:
+            stages = {
+                stage: {
+                    'count': count,
+                    'total_s': round(total, 6),
+                    'mean_ms': round(total / count * 1000, 3) if count else 0.0,
+                    'max_ms': round(maximum * 1000, 3),
+                }
+                for stage, (count, total, maximum) in sorted(self._stages.items())
+            }
+            counters = dict(sorted(self._counters.items()))
+        hit_rates = {}
+        for name, (hit, miss) in HIT_RATES.items():
+            hits, misses = counters.get(hit, 0), counters.get(miss, 0)
+            if hits + misses:
+                hit_rates[name] = round(hits / (hits + misses), 4)
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'elapsed_s': round(time.time() - self.started, 3),
+            'stages': stages,
+            'counters': counters,
+            'hit_rates': hit_rates,
+        }
+
+    def write(self, path):
+        """Write a snapshot to `path` atomically."""
+        temp_path = path + '.part'
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, indent=4)
+        os.replace(temp_path, path)
+        return path
+
+
+class NullMetrics:
+    """Disabled metrics: every call is a no-op."""
+
+    enabled = False
+
+    def timer(self, stage):
+        return _NULL_TIMER
+
+    def record(self, stage, seconds, count=1):
+        pass
+
+    def incr(self, name, value=1):
+        pass
+
+    def drain(self):
+        return None
+
+    def merge(self, data):
+        pass
+
+    def snapshot(self):
+        return {}
+
+    def write(self, path):
+        return None
+
+
+_metrics = NullMetrics()
+
+
+def get_metrics():
+    """Return the process-wide metrics (a no-op NullMetrics unless enabled)."""
+    return _metrics
+
+
+def enable_metrics():
+    """Switch the process-wide metrics on, starting from empty."""
+    global _metrics
+    _metrics = Metrics()
+    return _metrics
+
+
+def disable_metrics():
+    global _metrics
+    _metrics = NullMetrics()
+
+
+class SnapshotWriter:
+    """Background thread writing a metrics snapshot to a file every `interval` seconds."""
+
+    def __init__(self, metrics, path, interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='metrics-snapshot', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.metrics.write(self.path)
+            except OSError as e:
+                logging.error(f"Error writing metrics snapshot to '{self.path}': {e}")
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.metrics.write(self.path)
@@ -0,0 +1,571 @@
+import os
+import sys
+import zlib
+import glob
+import gzip
+import json
+import heapq
+import base64
+import hashlib
+import logging
+import argparse
+from collections import Counter
+from operator import itemgetter
+
+# NumPy is imported on first use so runs without corpus statistics never load it
+
+STATS_FILE = 'ngram_stats.json.gz'
+REPORT_FILE = 'collocations.json'
+FORMAT_VERSION = 1
+MODES = ('exact', 'sketch', 'auto')
+
+_SEPARATOR = '\x1f'
+_SMALL = 1e-20  # NLTK's smoothing constant in the likelihood ratio
+
+
+def _join(ngram):
+    return _SEPARATOR.join(ngram)
+
+
+def _split(key):
+    return tuple(key.split(_SEPARATOR))
+
+
+class NgramCounts:
+    """Exact unigram, bigram, skip-bigram (w1 _ w3) and trigram counts.
+
+    These are the counts NLTK's bigram and trigram collocation finders keep,
+    summed over documents; n-grams never span two documents.
+    """
+
+    def __init__(self):
+        self.documents = 0
+        self.unigrams = Counter()
+        self.bigrams = Counter()
+        self.skips = Counter()
+        self.trigrams = Counter()
+
+    def __len__(self):
+        return len(self.unigrams) + len(self.bigrams) + len(self.skips) + len(self.trigrams)
+
+    @property
+    def tokens(self):
+        return sum(self.unigrams.values())
+
+    def add_tokens(self, tokens, new_document=True):
+        """Count one document's tokens; pass `new_document=False` for later chunks of the same document."""
+        tokens = list(tokens)
+        self.documents += new_document
+        self.unigrams.update(tokens)
+        self.bigrams.update(zip(tokens, tokens[1:]))
+        self.skips.update(zip(tokens, tokens[2:]))
+        self.trigrams.update(zip(tokens, tokens[1:], tokens[2:]))
+
+    def merge(self, other):
+        """Add another NgramCounts (or its `to_dict` form) into this one."""
+        if isinstance(other, dict):
+            other = NgramCounts.from_dict(other)
+        self.documents += other.documents
+        self.unigrams.update(other.unigrams)
+        self.bigrams.update(other.bigrams)
+        self.skips.update(other.skips)
+        self.trigrams.update(other.trigrams)
+        return self
+
+    def to_dict(self):
+        return {
+            'documents': self.documents,
+            'unigrams': [[word, count] for word, count in self.unigrams.items()],
+            'bigrams': [[*ngram, count] for ngram, count in self.bigrams.items()],
+            'skips': [[*ngram, count] for ngram, count in self.skips.items()],
+            'trigrams': [[*ngram, count] for ngram, count in self.trigrams.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        counts = cls()
+        counts.documents = data['documents']
+        counts.unigrams = Counter({word: count for word, count in data['unigrams']})
+        counts.bigrams = Counter({tuple(row[:-1]): row[-1] for row in data['bigrams']})
+        counts.skips = Counter({tuple(row[:-1]): row[-1] for row in data['skips']})
+        counts.trigrams = Counter({tuple(row[:-1]): row[-1] for row in data['trigrams']})
+        return counts
+
+
+class CountMinSketch:
+    """Count-Min sketch over string keys.
+
+    Estimates never undercount; with `width` w and `depth` d, an estimate
+    exceeds the true count by more than 2N/w (N = total added) with
+    probability at most 2^-d. Keys are hashed with BLAKE2b, so sketches built
+    in different processes and runs line up and merge by adding tables.
+    """
+
+    def __init__(self, width=1 << 20, depth=4):
+        import numpy as np
+        self._np = np
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, keys):
+        np = self._np
+        hashes = np.array([hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest() for key in keys],
+                          dtype='V16').view(np.uint64).reshape(-1, 2)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        # Double hashing: row i uses h1 + i * h2
+        return ((hashes[:, 0][None, :] + rows * hashes[:, 1][None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    def update(self, counts):
+        """Add a `{key: count}` mapping."""
+        if not counts:
+            return
+        np = self._np
+        columns = self._columns(list(counts))
+        values = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], values)
+
+    def estimate(self, keys):
+        """Estimated counts of `keys`, as an int64 array."""
+        np = self._np
+        if not keys:
+            return np.zeros(0, dtype=np.int64)
+        columns = self._columns(keys)
+        return self.table[np.arange(self.depth)[:, None], columns].min(axis=0)
+
+    def merge(self, other):
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError(f"Cannot merge Count-Min sketches of shape {self.table.shape} and {other.table.shape}")
+        self.table += other.table
+        return self
+
+    def to_dict(self):
+        return {'width': self.width, 'depth': self.depth,
+                'table': base64.b64encode(zlib.compress(self.table.astype('<i8').tobytes())).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['width'], data['depth'])
+        raw = zlib.decompress(base64.b64decode(data['table']))
+        sketch.table = sketch._np.frombuffer(raw, dtype='<i8').astype(sketch._np.int64).reshape(sketch.depth,
+                                                                                                sketch.width)
+        return sketch
+
+
+class SpaceSaving:
+    """Mergeable heavy-hitter summary keeping about `capacity` keys.
+
+    Counts of monitored keys are upper bounds that overshoot by at most their
+    `errors` entry. The summary is compacted back to `capacity` keys once it
+    doubles; every dropped count raises `floor`, the bound on the count of any
+    key that is not monitored, and keys that reappear start from it.
+    """
+
+    def __init__(self, capacity=10000):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.floor = 0
+
+    def __len__(self):
+        return len(self.counts)
+
+    def update(self, counts):
+        """Add a `{key: count}` mapping."""
+        monitored = self.counts
+        for key, count in counts.items():
+            if key in monitored:
+                monitored[key] += count
+            else:
+                monitored[key] = self.floor + count
+                self.errors[key] = self.floor
+        if len(monitored) > 2 * self.capacity:
+            self.compact()
+
+    def compact(self):
+        """Keep the `capacity` largest counts."""
+        if len(self.counts) <= self.capacity:
+            return
+        kept = heapq.nlargest(self.capacity + 1, self.counts.items(), key=itemgetter(1))
+        self.floor = max(self.floor, kept[-1][1])
+        self.counts = dict(kept[:-1])
+        self.errors = {key: self.errors[key] for key in self.counts}
+
+    def merge(self, other):
+        counts = {}
+        errors = {}
+        for key in sorted(self.counts.keys() | other.counts.keys()):
+            counts[key] = self.counts.get(key, self.floor) + other.counts.get(key, other.floor)
+            errors[key] = self.errors.get(key, self.floor) + other.errors.get(key, other.floor)
+        self.counts, self.errors = counts, errors
+        self.floor += other.floor
+        self.capacity = max(self.capacity, other.capacity)
+        if len(self.counts) > 2 * self.capacity:
+            self.compact()
+        return self
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'floor': self.floor,
+                'items': [[key, count, self.errors[key]] for key, count in self.counts.items()]}
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls(data['capacity'])
+        summary.floor = data['floor']
+        summary.counts = {key: count for key, count, _ in data['items']}
+        summary.errors = {key: error for key, _, error in data['items']}
+        return summary
+
+
+class NgramStats:
+    """Corpus-level n-gram counts that merge across workers, runs and output folders.
+
+    In 'exact' mode all counts are kept. In 'sketch' mode unigram, bigram and
+    skip-bigram counts go into one Count-Min sketch and the most frequent
+    bigrams and trigrams are tracked with SpaceSaving summaries, so memory is
+    fixed however large the corpus. 'auto' starts exact and switches to
+    sketches once more than `exact_limit` distinct n-grams are held.
+    `top_bigrams` and `top_trigrams` rank by NLTK's likelihood ratio from
+    these counts alone, without revisiting any document.
+    """
+
+    def __init__(self, mode='auto', width=1 << 20, depth=4, capacity=100000, exact_limit=5000000):
+        if mode not in MODES:
+            raise ValueError(f"Unknown n-gram statistics mode: {mode}. Available: {', '.join(MODES)}")
+        self.mode = mode
+        self.width = width
+        self.depth = depth
+        self.capacity = capacity
+        self.exact_limit = exact_limit
+        self.documents = 0
+        self.tokens = 0
+        self.exact = None
+        self.marginals = None
+        self.heavy_bigrams = None
+        self.heavy_trigrams = None
+        if mode == 'sketch':
+            self._init_sketches()
+        else:
+            self.exact = NgramCounts()
+
+    @property
+    def is_sketch(self):
+        return self.exact is None
+
+    def _init_sketches(self):
+        self.marginals = CountMinSketch(self.width, self.depth)
+        self.heavy_bigrams = SpaceSaving(self.capacity)
+        self.heavy_trigrams = SpaceSaving(self.capacity)
+
+    def _sketch_counts(self, counts):
+        """Fold exact counts into the sketches."""
+        marginal_counts = {'1' + word: count for word, count in counts.unigrams.items()}
+        marginal_counts.update(('2' + _join(ngram), count) for ngram, count in counts.bigrams.items())
+        marginal_counts.update(('s' + _join(ngram), count) for ngram, count in counts.skips.items())
+        marginal_counts.update(('3' + _join(ngram), count) for ngram, count in counts.trigrams.items())
+        self.marginals.update(marginal_counts)
+        self.heavy_bigrams.update({_join(ngram): count for ngram, count in counts.bigrams.items()})
+        self.heavy_trigrams.update({_join(ngram): count for ngram, count in counts.trigrams.items()})
+
+    def _switch_to_sketch(self):
+        logging.info(f"N-gram statistics exceed {self.exact_limit} distinct n-grams; switching to sketches")
+        exact, self.exact = self.exact, None
+        self._init_sketches()
+        self._sketch_counts(exact)
+        self.mode = 'sketch'
+
+    def add_tokens(self, tokens):
+        """Count one document's tokens."""
+        counts = NgramCounts()
+        counts.add_tokens(tokens)
+        self.add_counts(counts)
+
+    def add_counts(self, counts):
+        """Add per-document counts (an NgramCounts or its `to_dict` form, e.g. shipped from a worker)."""
+        if isinstance(counts, dict):
+            counts = NgramCounts.from_dict(counts)
+        self.documents += counts.documents
+        self.tokens += counts.tokens
+        if self.is_sketch:
+            self._sketch_counts(counts)
+            return
+        self.exact.merge(counts)
+        if self.mode == 'auto' and len(self.exact) > self.exact_limit:
+            self._switch_to_sketch()
+
+    def merge(self, other):
+        """Merge another NgramStats; the result is a sketch if either side is."""
+        if other.is_sketch and not self.is_sketch:
+            self.width, self.depth, self.capacity = other.width, other.depth, other.capacity
+            self._switch_to_sketch()
+        self.documents += other.documents
+        self.tokens += other.tokens
+        if not self.is_sketch:
+            self.exact.merge(other.exact)
+            if self.mode == 'auto' and len(self.exact) > self.exact_limit:
+                self._switch_to_sketch()
+        elif other.is_sketch:
+            self.marginals.merge(other.marginals)
+            self.heavy_bigrams.merge(other.heavy_bigrams)
+            self.heavy_trigrams.merge(other.heavy_trigrams)
+        else:
+            self._sketch_counts(other.exact)
+        return self
+
+    def _lookup(self, counter, prefix, ngrams):
+        """Counts of `ngrams` from the exact counter or the Count-Min sketch, as a float array."""
+        np = self._np()
+        if self.is_sketch:
+            keys = [prefix + (ngram if isinstance(ngram, str) else _join(ngram)) for ngram in ngrams]
+            return self.marginals.estimate(keys).astype(np.float64)
+        return np.fromiter((counter[ngram] for ngram in ngrams), dtype=np.float64, count=len(ngrams))
+
+    @staticmethod
+    def _np():
+        import numpy as np
+        return np
+
+    def _candidates(self, n, min_count):
+        """Candidate n-grams with their (upper bound) counts."""
+        np = self._np()
+        if self.is_sketch:
+            summary = self.heavy_bigrams if n == 2 else self.heavy_trigrams
+            keys = list(summary.counts)
+            ngrams = [_split(key) for key in keys]
+            counts = np.fromiter((summary.counts[key] for key in keys), dtype=np.float64, count=len(keys))
+            # Both structures overcount, so the smaller estimate is the better one
+            counts = np.minimum(counts, self.marginals.estimate(['23'[n - 2] + key for key in keys]))
+        else:
+            counter = self.exact.bigrams if n == 2 else self.exact.trigrams
+            ngrams = list(counter)
+            counts = np.fromiter(counter.values(), dtype=np.float64, count=len(ngrams))
+        keep = counts >= min_count
+        return [ngram for ngram, kept in zip(ngrams, keep) if kept], counts[keep]
+
+    def _unigram_counts(self, words):
+        return self._lookup(None if self.is_sketch else self.exact.unigrams, '1', words)
+
+    def top_bigrams(self, k=20, min_count=1):
+        """The `k` bigrams with the highest likelihood ratio, as `(ngram, score, count)` tuples."""
+        np = self._np()
+        ngrams, n_ii = self._candidates(2, min_count)
+        if not ngrams:
+            return []
+        n_xx = float(self.tokens)
+        n_ix = self._unigram_counts([ngram[0] for ngram in ngrams])
+        n_xi = self._unigram_counts([ngram[1] for ngram in ngrams])
+        contingency = np.array([n_ii, n_xi - n_ii, n_ix - n_ii, n_xx - n_ix - n_xi + n_ii])
+        scores = _likelihood_ratio(contingency, [n_ix, n_xi], n_xx)
+        return _top(ngrams, scores, n_ii, k)
+
+    def top_trigrams(self, k=20, min_count=1):
+        """The `k` trigrams with the highest likelihood ratio, as `(ngram, score, count)` tuples."""
+        np = self._np()
+        ngrams, n_iii = self._candidates(3, min_count)
+        if not ngrams:
+            return []
+        n_xxx = float(self.tokens)
+        bigrams, skips = (None, None) if self.is_sketch else (self.exact.bigrams, self.exact.skips)
+        n_iix = self._lookup(bigrams, '2', [ngram[:2] for ngram in ngrams])
+        n_ixi = self._lookup(skips, 's', [ngram[::2] for ngram in ngrams])
+        n_xii = self._lookup(bigrams, '2', [ngram[1:] for ngram in ngrams])
+        n_ixx, n_xix, n_xxi = (self._unigram_counts([ngram[i] for ngram in ngrams]) for i in range(3))
+        n_oii = n_xii - n_iii
+        n_ioi = n_ixi - n_iii
+        n_iio = n_iix - n_iii
+        n_ooi = n_xxi - n_iii - n_oii - n_ioi
+        n_oio = n_xix - n_iii - n_oii - n_iio
+        n_ioo = n_ixx - n_iii - n_ioi - n_iio
+        n_ooo = n_xxx - n_iii - n_oii - n_ioi - n_iio - n_ooi - n_oio - n_ioo
+        contingency = np.array([n_iii, n_oii, n_ioi, n_ooi, n_iio, n_oio, n_ioo, n_ooo])
+        scores = _likelihood_ratio(contingency, [n_ixx, n_xix, n_xxi], n_xxx)
+        return _top(ngrams, scores, n_iii, k)
+
+    def report(self, k=20, min_count=1):
+        """Top-k bigrams and trigrams by likelihood ratio, ready for JSON."""
+        def rows(top):
+            return [{'ngram': list(ngram), 'score': round(score, 4), 'count': int(count)}
+                    for ngram, score, count in top]
+        return {
+            'mode': 'sketch' if self.is_sketch else 'exact',
+            'documents': self.documents,
+            'tokens': self.tokens,
+            'bigrams': rows(self.top_bigrams(k, min_count)),
+            'trigrams': rows(self.top_trigrams(k, min_count)),
+        }
+
+    def to_dict(self):
+        data = {'version': FORMAT_VERSION, 'mode': 'sketch' if self.is_sketch else 'exact',
+                'documents': self.documents, 'tokens': self.tokens}
+        if self.is_sketch:
+            data.update(marginals=self.marginals.to_dict(), bigrams=self.heavy_bigrams.to_dict(),
+                        trigrams=self.heavy_trigrams.to_dict())
+        else:
+            data['counts'] = self.exact.to_dict()
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported n-gram statistics version: {data.get('version')}")
+        if data['mode'] == 'sketch':
+            marginals = CountMinSketch.from_dict(data['marginals'])
+            bigrams = SpaceSaving.from_dict(data['bigrams'])
+            stats = cls('sketch', marginals.width, marginals.depth, bigrams.capacity)
+            stats.marginals = marginals
+            stats.heavy_bigrams = bigrams
+            stats.heavy_trigrams = SpaceSaving.from_dict(data['trigrams'])
+        else:
+            stats = cls('exact')
+            stats.exact = NgramCounts.from_dict(data['counts'])
+        stats.documents = data['documents']
+        stats.tokens = data['tokens']
+        return stats
+
+    def save(self, path):
+        """Write the statistics as gzipped JSON, atomically."""
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
+
+
+def _likelihood_ratio(contingency, unigram_counts, total):
+    """NLTK's likelihood ratio, vectorized over candidates.
+
+    `contingency` holds one row per cell in NLTK's order (bit i of the cell
+    index set means word i is absent); expected cell counts come from the
+    unigram marginals.
+    """
+    np = NgramStats._np()
+    contingency = np.maximum(contingency, 0)  # Sketch estimates can disagree slightly
+    expected = np.empty_like(contingency)
+    for cell in range(contingency.shape[0]):
+        product = np.ones(contingency.shape[1])
+        for i, counts in enumerate(unigram_counts):
+            product *= total - counts if cell >> i & 1 else counts
+        expected[cell] = product / total ** (len(unigram_counts) - 1)
+    return 2 * np.sum(contingency * np.log(contingency / (expected + _SMALL) + _SMALL), axis=0)
+
+
+def _top(ngrams, scores, counts, k):
+    """The k best (ngram, score, count) by descending score, ties broken by n-gram as NLTK does."""
+    np = NgramStats._np()
+    if len(scores) > k:
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        selected = np.flatnonzero(scores >= threshold)
+    else:
+        selected = range(len(scores))
+    ranked = sorted(((ngrams[i], float(scores[i]), float(counts[i])) for i in selected), key=lambda t: (-t[1], t[0]))
+    return ranked[:k]
+
+
+def stats_from_env():
+    """Return an empty NgramStats configured from NGRAM_STATS* variables, or None when disabled."""
+    mode = os.getenv('NGRAM_STATS', 'off')
+    if mode == 'off':
+        return None
+    return NgramStats(
+        mode,
+        width=int(os.getenv('NGRAM_STATS_WIDTH', str(1 << 20))),
+        depth=int(os.getenv('NGRAM_STATS_DEPTH', '4')),
+        capacity=int(os.getenv('NGRAM_STATS_CAPACITY', '100000')),
+        exact_limit=int(os.getenv('NGRAM_STATS_EXACT_LIMIT', '5000000')),
+    )
+
+
+def save_run_stats(stats, output_dir, k=20):
+    """Write `ngram_stats.json.gz` (mergeable) and a `collocations.json` report to a run folder."""
+    stats_file = stats.save(os.path.join(output_dir, STATS_FILE))
+    report_file = os.path.join(output_dir, REPORT_FILE)
+    with open(report_file, 'w', encoding='utf-8') as file:
+        json.dump(stats.report(k), file, indent=4)
+    logging.info(f"N-gram statistics for {stats.documents} documents saved to {stats_file}")
+    return stats_file
+
+
+# Per-document counts collected in this process (e.g. a worker), drained by the coordinator
+_collected = None
+
+
+def enable_collection():
+    """Start collecting per-document n-gram counts in this process."""
+    global _collected
+    if _collected is None:
+        _collected = NgramCounts()
+
+
+def collecting():
+    return _collected is not None
+
+
+def collect_tokens(tokens, new_document=True):
+    """Count one document's tokens (or a later chunk of it) if collection is enabled."""
+    if _collected is not None:
+        _collected.add_tokens(tokens, new_document)
+
+
+def drain_collected():
+    """Return the counts collected since the last drain (as a dict) and reset them; None if disabled or empty."""
+    global _collected
+    if _collected is None or not _collected.documents:
+        return None
+    data, _collected = _collected.to_dict(), NgramCounts()
+    return data
+
+
+def find_stats_files(paths):
+    """Statistics files in the given files or output folders (searched recursively)."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '**', STATS_FILE), recursive=True)))
+        else:
+            files.append(path)
+    return files
+
+
+def merge_stats(paths):
+    """Merge the statistics of several runs or output folders into one NgramStats."""
+    merged = None
+    for stats_file in find_stats_files(paths):
+        stats = NgramStats.load(stats_file)
+        merged = stats if merged is None else merged.merge(stats)
+        logging.info(f"Merged {stats.documents} documents from {stats_file}")
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Merge n-gram statistics of runs and report top collocations.')
+    parser.add_argument('paths', nargs='+', help=f"Run or output folders (searched for {STATS_FILE}) or stats files")
+    parser.add_argument('--top', type=int, default=20, help='Number of bigrams and trigrams to report')
+    parser.add_argument('--min-count', type=int, default=1, help='Ignore n-grams seen fewer times')
+    parser.add_argument('--save', help='Also write the merged statistics to this file')
+    parser.add_argument('--output', help='Write the report here instead of stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    merged = merge_stats(args.paths)
+    if merged is None:
+        logging.error(f"No {STATS_FILE} found in {', '.join(args.paths)}")
+        return 1
+    if args.save:
+        merged.save(args.save)
+    report = json.dumps(merged.report(args.top, args.min_count), indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(report)
+    else:
+        print(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+import os
+import gzip
+import json
+import glob
+import time
+import hashlib
+import logging
+import threading
+from file_processor import save_results, output_name
+
+
+class PerFileWriter:
+    """Write one pretty-printed `<name>_<path hash>_analysis.json` per input (the original layout)."""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def write(self, file_path, results):
+        return save_results(results, output_name(file_path), self.output_dir)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def bind_ledger(self, ledger):
+        # Results are on disk as soon as `write` returns; the ledger keeps its own batching
+        pass
+
+
+class JsonLinesWriter:
+    """Write results as compact JSON Lines segments, one record per input.
+
+    Records are buffered and written as numbered segments
+    (`results-00001.jsonl.gz`, ...) every `flush_every` records or
+    `flush_interval` seconds. Each segment is written to a temporary file and
+    renamed into place, so readers never see a partial segment. With
+    `text_by_reference`, extracted text is stored once per distinct text in
+    matching `texts-*.jsonl.gz` segments and records carry its SHA-256 in
+    `extracted_text_ref`.
+    """
+
+    def __init__(self, output_dir, prefix='results', compress=True, flush_every=1000, flush_interval=30.0,
+                 text_by_reference=False):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.compress = compress
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.text_by_reference = text_by_reference
+        self._lock = threading.Lock()
+        self._records = []
+        self._texts = []
+        self._seen_texts = set()
+        self._segment = 0
+        self._last_flush = time.monotonic()
+        self._ledgers = []
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, file_path, results):
+        record = {'source': os.path.abspath(file_path), 'file_name': os.path.basename(file_path)}
+        record.update(results)
+        text = digest = None
+        if self.text_by_reference and 'extracted_text' in record:
+            text = record.pop('extracted_text')
+            digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+            record['extracted_text_ref'] = digest
+        with self._lock:
+            if digest is not None and digest not in self._seen_texts:
+                self._seen_texts.add(digest)
+                self._texts.append({'sha256': digest, 'text': text})
+            self._records.append(record)
+            if len(self._records) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _segment_path(self, kind):
+        extension = '.jsonl.gz' if self.compress else '.jsonl'
+        return os.path.join(self.output_dir, f"{kind}-{self._segment:05d}{extension}")
+
+    def _write_segment(self, path, rows):
+        temp_path = path + '.part'
+        opener = gzip.open if self.compress else open
+        with opener(temp_path, 'wt', encoding='utf-8') as file:
+            for row in rows:
+                file.write(json.dumps(row, separators=(',', ':')))
+                file.write('\n')
+        os.replace(temp_path, path)
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._records:
+            return
+        self._segment += 1
+        # Texts first, so a visible results segment never references a missing text
+        if self._texts:
+            self._write_segment(self._segment_path('texts'), self._texts)
+        path = self._segment_path(self.prefix)
+        self._write_segment(path, self._records)
+        logging.info(f"Wrote {len(self._records)} results to {path}")
+        self._records = []
+        self._texts = []
+        for ledger in self._ledgers:
+            ledger.commit()
+
+    def bind_ledger(self, ledger):
+        """Commit the ledger only after each segment is on disk.
+
+        Otherwise a crash could leave files marked as processed whose
+        results were still buffered.
+        """
+        ledger.commit_every = 0
+        self._ledgers.append(ledger)
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        self.flush()
+
+
+def iter_results(output_dir, prefix='results', resolve_text=False):
+    """Yield result records from a run folder's JSON Lines segments in order.
+
+    With `resolve_text`, records written by reference get their
+    `extracted_text` back from the texts segments.
+    """
+    texts = {}
+    if resolve_text:
+        for path in sorted(glob.glob(os.path.join(output_dir, 'texts-*.jsonl*'))):
+            if path.endswith('.part'):
+                continue
+            for row in _read_segment(path):
+                texts[row['sha256']] = row['text']
+    for path in sorted(glob.glob(os.path.join(output_dir, f"{prefix}-*.jsonl*"))):
+        if path.endswith('.part'):
+            continue
+        for record in _read_segment(path):
+            if resolve_text and 'extracted_text_ref' in record:
+                record['extracted_text'] = texts.get(record.pop('extracted_text_ref'))
+            yield record
+
+
+def _read_segment(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def open_writer(output_dir, output_format='json', **options):
+    """Create the writer for an output format: 'json' (one file per input) or 'jsonl'."""
+    if output_format == 'json':
+        return PerFileWriter(output_dir)
+    if output_format == 'jsonl':
+        return JsonLinesWriter(output_dir, **options)
+    raise ValueError(f"Unknown output format: {output_format}")
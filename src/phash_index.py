@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    hash TEXT NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    config TEXT NOT NULL,
+    results TEXT NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_last_access ON images (last_access);
+"""
+
+# Bump when the hashed content changes so entries hashed the old way stop matching
+HASH_VERSION = 2
+# 16 px is fine enough that changing a word or a digit in a region flips many bits
+MASK_HASH_SIZE = 16
+
+
+def dhash(gray, hash_size=8):
+    """Difference hash of a grayscale image as a `hash_size`²-bit integer."""
+    import cv2
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def mask_hashes(binary, boxes, hash_size=MASK_HASH_SIZE):
+    """dHashes of a binarized text mask: one for the page and one per (x, y, w, h) region box.
+
+    The mask holds only the text strokes, so two screenshots with the same
+    layout but different words or numbers get different region hashes.
+    """
+    page_hash = dhash(binary, hash_size)
+    return page_hash, [dhash(binary[y:y + h, x:x + w], hash_size) for x, y, w, h in boxes]
+
+
+def _config_key(config):
+    return json.dumps([HASH_VERSION, config], sort_keys=True)
+
+
+class PHashIndex:
+    """Persistent perceptual-hash index of OCR results for near-duplicate images.
+
+    Images are hashed on their binarized text mask. A stored image matches when
+    the resized dimensions and extraction settings are equal, the page hashes
+    differ in at most `max_distance` bits, and it has the same OCR regions:
+    every box within `box_tolerance` pixels and every region hash within
+    `max_distance` bits. The index keeps at most `max_entries` images,
+    dropping the least recently used ones.
+    """
+
+    def __init__(self, path, max_distance=4, max_entries=10000, box_tolerance=3):
+        self.path = path
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.box_tolerance = box_tolerance
+        self._lock = threading.RLock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        # id -> (hash, width, height, config); results stay on disk until matched
+        self._entries = {
+            row[0]: (int(row[1], 16), row[2], row[3], row[4])
+            for row in self._conn.execute('SELECT id, hash, width, height, config FROM images')
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _same_regions(self, stored, boxes, region_hashes):
+        if len(stored) != len(boxes):
+            return False
+        for result, box, region_hash in zip(stored, boxes, region_hashes):
+            if any(abs(a - b) > self.box_tolerance for a, b in zip(result['box'], box)):
+                return False
+            if 'hash' not in result or (int(result['hash'], 16) ^ region_hash).bit_count() > self.max_distance:
+                return False
+        return True
+
+    def lookup(self, image_hash, width, height, config, boxes, region_hashes):
+        """Return stored region results for the closest matching image, or None.
+
+        `boxes` are the image's planned OCR regions and `region_hashes` their
+        mask hashes, as from `mask_hashes`.
+        """
+        config = _config_key(config)
+        with self._lock:
+            candidates = []
+            for entry_id, (other, w, h, other_config) in self._entries.items():
+                if w != width or h != height or other_config != config:
+                    continue
+                distance = (image_hash ^ other).bit_count()
+                if distance <= self.max_distance:
+                    candidates.append((distance, entry_id))
+            # A close page hash only narrows the search; the regions have to match too
+            for distance, entry_id in sorted(candidates):
+                row = self._conn.execute('SELECT results FROM images WHERE id = ?', (entry_id,)).fetchone()
+                if row is None:
+                    continue
+                stored = json.loads(row[0])
+                if not self._same_regions(stored, boxes, region_hashes):
+                    continue
+                self._conn.execute('UPDATE images SET last_access = ? WHERE id = ?', (time.time(), entry_id))
+                self._conn.commit()
+                logging.info(f"Perceptual hash match at distance {distance}")
+                return [{'box': tuple(result['box']), 'text': result['text']} for result in stored]
+        return None
+
+    def add(self, image_hash, width, height, config, results, region_hashes):
+        """Store region results for an image, with the mask hash of each result's region."""
+        config = _config_key(config)
+        encoded = json.dumps([{'box': list(r['box']), 'text': r['text'], 'hash': format(region_hash, 'x')}
+                              for r, region_hash in zip(results, region_hashes)])
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO images (hash, width, height, config, results, last_access) VALUES (?, ?, ?, ?, ?, ?)',
+                (format(image_hash, 'x'), width, height, config, encoded, time.time()),
+            )
+            self._entries[cursor.lastrowid] = (image_hash, width, height, config)
+            if len(self._entries) > self.max_entries:
+                self._evict(len(self._entries) - self.max_entries)
+            self._conn.commit()
+
+    def _evict(self, count):
+        rows = self._conn.execute('SELECT id FROM images ORDER BY last_access LIMIT ?', (count,)).fetchall()
+        self._conn.executemany('DELETE FROM images WHERE id = ?', rows)
+        for (entry_id,) in rows:
+            self._entries.pop(entry_id, None)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def open_phash_index(path, max_distance=4, max_entries=10000):
+    """Return the shared index for a database path."""
+    path = os.path.abspath(path)
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = PHashIndex(path, max_distance, max_entries)
+        return index
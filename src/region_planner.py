@@ -0,0 +1,104 @@
+# Boxes are (x, y, w, h) tuples as returned by cv2.boundingRect.
+
+# The original fixed threshold of 500 px² was tuned on 800x600 images
+REFERENCE_AREA = 800 * 600
+MIN_AREA_RATIO = 500 / REFERENCE_AREA
+
+
+def min_area_for(image_shape, ratio=MIN_AREA_RATIO):
+    """Minimum region area for an image, scaled with the image size."""
+    height, width = image_shape[:2]
+    return ratio * height * width
+
+
+def _contains(outer, inner):
+    ox, oy, ow, oh = outer
+    ix, iy, iw, ih = inner
+    return ox <= ix and oy <= iy and ix + iw <= ox + ow and iy + ih <= oy + oh
+
+
+def _near(a, b, gap_x, gap_y):
+    """True when two boxes overlap or are within the given gaps of each other."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return (ax - gap_x < bx + bw and bx - gap_x < ax + aw and
+            ay - gap_y < by + bh and by - gap_y < ay + ah)
+
+
+def _union(a, b):
+    x = min(a[0], b[0])
+    y = min(a[1], b[1])
+    return (x, y, max(a[0] + a[2], b[0] + b[2]) - x, max(a[1] + a[3], b[1] + b[3]) - y)
+
+
+def drop_contained(boxes):
+    """Remove boxes that lie entirely inside another box."""
+    kept = []
+    # Largest first so containers are seen before what they contain
+    for box in sorted(boxes, key=lambda b: b[2] * b[3], reverse=True):
+        if not any(_contains(other, box) for other in kept):
+            kept.append(box)
+    return kept
+
+
+def merge_boxes(boxes, gap_x, gap_y):
+    """Merge overlapping or nearby boxes until no pair is left to merge."""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        while boxes:
+            current = boxes.pop()
+            i = 0
+            while i < len(boxes):
+                if _near(current, boxes[i], gap_x, gap_y):
+                    current = _union(current, boxes.pop(i))
+                    merged = True
+                    i = 0
+                else:
+                    i += 1
+            result.append(current)
+        boxes = result
+    return boxes
+
+
+def reading_order(boxes):
+    """Sort boxes top-to-bottom by line, then left-to-right within a line."""
+    lines = []
+    for box in sorted(boxes, key=lambda b: b[1]):
+        center = box[1] + box[3] / 2
+        for line in lines:
+            top, bottom = line['top'], line['bottom']
+            if top <= center <= bottom:
+                line['boxes'].append(box)
+                line['top'] = min(top, box[1])
+                line['bottom'] = max(bottom, box[1] + box[3])
+                break
+        else:
+            lines.append({'top': box[1], 'bottom': box[1] + box[3], 'boxes': [box]})
+    return [box for line in lines for box in sorted(line['boxes'], key=lambda b: b[0])]
+
+
+def plan_regions(boxes, image_shape, gap_x_ratio=0.015, gap_y_ratio=0.005, min_area_ratio=MIN_AREA_RATIO):
+    """Turn raw contour boxes into OCR regions.
+
+    Drops boxes below the size-scaled area threshold and boxes nested in others,
+    merges overlapping or nearby boxes into line/block regions and returns them
+    in reading order together with planning statistics.
+    """
+    height, width = image_shape[:2]
+    min_area = min_area_for(image_shape, min_area_ratio)
+    candidates = [tuple(int(v) for v in box) for box in boxes if box[2] * box[3] > min_area]
+    uncontained = drop_contained(candidates)
+    merged = merge_boxes(uncontained, max(1, gap_x_ratio * width), max(1, gap_y_ratio * height))
+    regions = reading_order(merged)
+    stats = {
+        'contours': len(boxes),
+        'candidates': len(candidates),
+        'dropped_contained': len(candidates) - len(uncontained),
+        'merged': len(uncontained) - len(merged),
+        'regions': len(regions),
+        'ocr_calls_saved': len(candidates) - len(regions),
+    }
+    return regions, stats
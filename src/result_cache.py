@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from ledger import hash_file
+
+# Bump when extraction or analysis output changes so stale entries stop matching
+EXTRACTION_VERSION = 1
+ANALYSIS_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    tier TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (tier, key)
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+"""
+
+
+def config_digest(config):
+    """Stable digest of a JSON-serializable configuration."""
+    encoded = json.dumps(config, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def text_digest(text):
+    """SHA-256 of a text string."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Persistent content-addressed cache for extracted text and analysis results.
+
+    The `text` tier maps file content hash plus extraction settings to the
+    extracted text. The `analysis` tier maps extracted-text hash plus the
+    filter-file hash to the analysis results. Entries are evicted least
+    recently used first once the cache grows beyond `max_bytes`. Reads do not
+    write: access times are buffered and stored with the periodic eviction, at
+    `close()`, or once `access_buffer` of them have accumulated.
+    """
+
+    TIERS = ('text', 'analysis')
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, evict_every=50, access_buffer=1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self.access_buffer = access_buffer
+        self._lock = threading.RLock()
+        self._puts = 0
+        # (tier, key) -> last access time not yet written to the database
+        self._accessed = {}
+        self._filter_hashes = {}
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def get(self, tier, key):
+        """Return the cached value or None, marking the entry as recently used."""
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM entries WHERE tier = ? AND key = ?', (tier, key)).fetchone()
+            if row is None:
+                return None
+            self._accessed[(tier, key)] = time.time()
+            if len(self._accessed) >= self.access_buffer:
+                self._write_accesses()
+                self._conn.commit()
+            return json.loads(row[0])
+
+    def _write_accesses(self):
+        """Store buffered access times; the caller commits."""
+        if self._accessed:
+            self._conn.executemany('UPDATE entries SET last_access = ? WHERE tier = ? AND key = ?',
+                                   [(accessed, tier, key) for (tier, key), accessed in self._accessed.items()])
+            self._accessed = {}
+
+    def put(self, tier, key, value):
+        """Store a JSON-serializable value."""
+        if tier not in self.TIERS:
+            raise ValueError(f"Unknown cache tier: {tier}")
+        encoded = json.dumps(value)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (tier, key, value, size, last_access) VALUES (?, ?, ?, ?, ?)',
+                (tier, key, encoded, len(encoded), time.time()),
+            )
+            self._conn.commit()
+            self._puts += 1
+            if self._puts % self.evict_every == 0:
+                self.evict()
+
+    def size(self):
+        """Total size in bytes of all cached values."""
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in `max_bytes`."""
+        with self._lock:
+            # Recency has to be current before choosing what to drop
+            self._write_accesses()
+            self._conn.commit()
+            excess = self.size() - self.max_bytes
+            if excess <= 0:
+                return 0
+            removed = 0
+            rows = self._conn.execute('SELECT tier, key, size FROM entries ORDER BY last_access').fetchall()
+            victims = []
+            for tier, key, size in rows:
+                if removed >= excess:
+                    break
+                victims.append((tier, key))
+                removed += size
+            self._conn.executemany('DELETE FROM entries WHERE tier = ? AND key = ?', victims)
+            self._conn.commit()
+            logging.info(f"Evicted {len(victims)} cache entries ({removed} bytes)")
+            return len(victims)
+
+    def filter_hash(self, filter_file):
+        """Hash of the filter file contents, memoized by path, size and mtime."""
+        if not filter_file:
+            return None
+        stat = os.stat(filter_file)
+        identity = (os.path.abspath(filter_file), stat.st_size, stat.st_mtime_ns)
+        if identity not in self._filter_hashes:
+            self._filter_hashes[identity] = hash_file(filter_file)
+        return self._filter_hashes[identity]
+
+    def text_key(self, content_hash, extraction_config):
+        """Key for the extracted-text tier."""
+        return f"{content_hash}:{config_digest([EXTRACTION_VERSION, extraction_config])}"
+
+    def _analysis_digest(self, filter_file, profile=None):
+        profile_key = list(profile.key()) if profile is not None else None
+        return config_digest([ANALYSIS_VERSION, self.filter_hash(filter_file), profile_key])
+
+    def analysis_key(self, text, filter_file, profile=None):
+        """Key for the analysis tier; results of different analysis profiles are cached separately."""
+        return f"{text_digest(text)}:{self._analysis_digest(filter_file, profile)}"
+
+    def stream_key(self, content_hash, extraction_config, filter_file, profile=None):
+        """Analysis-tier key for a streamed file, which has no extracted text to hash."""
+        return (f"stream:{self.text_key(content_hash, extraction_config)}:"
+                f"{self._analysis_digest(filter_file, profile)}")
+
+    def close(self):
+        """Apply eviction and close the database."""
+        with self._lock:
+            if self._conn is not None:
+                self.evict()
+                self._conn.close()
+                self._conn = None
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def open_cache(path, max_bytes=None):
+    """Return the shared cache for a database path."""
+    path = os.path.abspath(path)
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            cache = _caches[path] = ResultCache(path, **({'max_bytes': max_bytes} if max_bytes else {}))
+        return cache
+
+
+def close_caches():
+    """Close every cache opened through `open_cache`."""
+    with _caches_lock:
+        for cache in _caches.values():
+            cache.close()
+        _caches.clear()
@@ -0,0 +1,132 @@
+import os
+import time
+import fnmatch
+import logging
+import threading
+
+
+def parse_patterns(value):
+    """Split a comma-separated list of glob patterns (e.g. from an environment variable)."""
+    if not value:
+        return []
+    return [pattern.strip() for pattern in value.split(',') if pattern.strip()]
+
+
+class DirectoryScanner:
+    """Single-pass `os.scandir` walk of a directory tree.
+
+    Patterns are matched against both the file name and the path relative to
+    the root (with `/` separators). A file is selected when it matches one of
+    `include` (or `include` is empty) and none of `exclude`; directories that
+    match `exclude` are not entered. With a `snapshot` (the processed-files
+    ledger), files whose size and modification time are unchanged since they
+    were processed are skipped without further work.
+    """
+
+    def __init__(self, root, include=None, exclude=None, snapshot=None, follow_symlinks=False):
+        self.root = root
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.snapshot = snapshot
+        self.follow_symlinks = follow_symlinks
+        self.stats = {'directories': 0, 'files': 0, 'unchanged': 0}
+
+    @staticmethod
+    def _matches(patterns, rel_path, name):
+        return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern) for pattern in patterns)
+
+    def _walk(self):
+        """Yield DirEntry objects of selected files, depth-first in name order."""
+        stack = [(self.root, '')]
+        while stack:
+            directory, rel_dir = stack.pop()
+            try:
+                with os.scandir(directory) as iterator:
+                    entries = sorted(iterator, key=lambda entry: entry.name)
+            except OSError as e:
+                logging.error(f"Error scanning directory '{directory}': {e}")
+                continue
+            self.stats['directories'] += 1
+            subdirectories = []
+            for entry in entries:
+                rel_path = rel_dir + entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                        if not self._matches(self.exclude, rel_path, entry.name):
+                            subdirectories.append((entry.path, rel_path + '/'))
+                        continue
+                    if not entry.is_file(follow_symlinks=self.follow_symlinks):
+                        continue
+                except OSError:
+                    continue
+                if self.include and not self._matches(self.include, rel_path, entry.name):
+                    continue
+                if self._matches(self.exclude, rel_path, entry.name):
+                    continue
+                yield entry
+            stack.extend(reversed(subdirectories))
+
+    def _signature(self, entry):
+        stat = entry.stat(follow_symlinks=self.follow_symlinks)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _unchanged(self, path, signature):
+        return self.snapshot is not None and self.snapshot.is_unchanged(path, *signature)
+
+    def files(self):
+        """Yield the paths of selected files that are new or changed since the snapshot."""
+        for entry in self._walk():
+            if self.snapshot is not None:
+                try:
+                    signature = self._signature(entry)
+                except OSError:
+                    continue
+                if self._unchanged(entry.path, signature):
+                    self.stats['unchanged'] += 1
+                    continue
+            self.stats['files'] += 1
+            yield entry.path
+
+    def watch(self, interval=5.0, batch_size=100, stop=None):
+        """Rescan every `interval` seconds and yield lists of new or changed files until `stop` is set.
+
+        A file is handed out once its size and modification time have stopped
+        changing (it is older than `interval` or unchanged since the last scan),
+        so files still being written are picked up on a later scan.
+        """
+        stop = stop or threading.Event()
+        handed_out = {}
+        candidates = {}
+        while not stop.is_set():
+            settled_before = time.time_ns() - int(interval * 1e9)
+            seen = {}
+            pending = {}
+            batch = []
+            for entry in self._walk():
+                path = entry.path
+                try:
+                    signature = self._signature(entry)
+                except OSError:
+                    continue
+                if handed_out.get(path) == signature:
+                    seen[path] = signature
+                    continue
+                if self._unchanged(path, signature):
+                    self.stats['unchanged'] += 1
+                    seen[path] = signature
+                    continue
+                if signature[1] > settled_before and candidates.get(path) != signature:
+                    pending[path] = signature
+                    continue
+                seen[path] = signature
+                self.stats['files'] += 1
+                batch.append(path)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            # Forget files that disappeared so the bookkeeping stays bounded
+            handed_out = seen
+            candidates = pending
+            if batch:
+                yield batch
+            stop.wait(interval)
@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import analyzer_pool
+from file_processor import get_extractor, extract_text, is_supported, should_stream, process_stream, IMAGE_EXTENSIONS
+from metrics import get_metrics, enable_metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large',
+            422: 'Unprocessable Entity', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class RequestError(Exception):
+    """An error reported to the client with an HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _init_ocr_worker(collect_metrics=False):
+    """OCR pool initializer: build the TextExtractor once per worker process."""
+    if collect_metrics:
+        enable_metrics()
+    get_extractor()
+
+
+def _ocr_task(file_path):
+    """OCR worker entry point. Returns (text, metrics)."""
+    return extract_text(file_path), get_metrics().drain()
+
+
+class AnalysisService:
+    """Long-running analysis server on localhost HTTP, built on asyncio.
+
+    Requests carry raw text or a file path. Images are OCR'd on a pool of worker
+    processes that each keep a warm TextExtractor; text and JSON files are read
+    on a thread, and files large enough to stream are analyzed chunk by chunk
+    on `stream_workers` threads of their own. Extracted texts go through a
+    bounded queue to a single analysis thread, which takes whatever has arrived within `batch_wait` seconds (up to
+    `batch_size` texts) and analyzes it with one `analyze_texts` call. Once
+    `max_pending` requests are in flight, new ones are rejected with 503 so the
+    client can retry later instead of piling up work.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8765, filter_file=None, batch_size=32, batch_wait=0.01,
+                 queue_size=256, max_pending=1024, ocr_workers=None, stream_workers=1):
+        self.host = host
+        self.port = port
+        self.filter_file = filter_file
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.queue_size = queue_size
+        self.max_pending = max_pending
+        self.ocr_workers = ocr_workers or os.cpu_count() or 1
+        self._pending = 0
+        self._queue = None
+        self._server = None
+        self._batcher = None
+        self._ocr_pool = None
+        # One thread owns the warm TextAnalysis; the pool hands out per-thread instances
+        self._analysis_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='analysis')
+        # Streamed files take long enough to stall every micro-batch, so they get their own threads
+        self._stream_threads = ThreadPoolExecutor(max_workers=stream_workers, thread_name_prefix='stream')
+
+    def _analysis(self):
+        return analyzer_pool.get_analysis(self.filter_file)
+
+    async def start(self):
+        """Warm the analyzers, start the OCR pool and listen for connections."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._analysis_thread, analyzer_pool.warm_up, self.filter_file)
+        # Libraries are loaded by now; this only builds the stream thread's own TextAnalysis
+        await loop.run_in_executor(self._stream_threads, analyzer_pool.warm_up, self.filter_file)
+        self._ocr_pool = ProcessPoolExecutor(max_workers=self.ocr_workers, initializer=_init_ocr_worker,
+                                             initargs=(get_metrics().enabled,))
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._batcher = asyncio.create_task(self._run_batches())
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logging.info(f"Analysis service listening on http://{self.host}:{self.port}")
+        return self
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stop accepting requests and release the worker pools."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        if self._ocr_pool is not None:
+            self._ocr_pool.shutdown(wait=True, cancel_futures=True)
+            self._ocr_pool = None
+        self._analysis_thread.shutdown(wait=True)
+        self._stream_threads.shutdown(wait=True, cancel_futures=True)
+        analyzer_pool.teardown()
+
+    # Analysis
+
+    async def _run_batches(self):
+        """Drain the queue in micro-batches and analyze each batch in one call."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            texts = [text for text, _ in batch]
+            futures = [future for _, future in batch]
+            try:
+                outcomes = [(result, None) for result in
+                            await loop.run_in_executor(self._analysis_thread, self._analyze_batch, texts)]
+            except Exception as e:
+                if len(batch) == 1:
+                    outcomes = [(None, e)]
+                else:
+                    # One bad text must not fail the whole batch; retry each text on its own
+                    logging.warning(f"Batch of {len(batch)} texts failed ({e}), analyzing them one at a time")
+                    outcomes = await loop.run_in_executor(self._analysis_thread, self._analyze_each, texts)
+            for future, (result, error) in zip(futures, outcomes):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def _analyze_batch(self, texts):
+        metrics = get_metrics()
+        metrics.incr('service.batches')
+        metrics.incr('service.batched_texts', len(texts))
+        with metrics.timer('analyze'):
+            return self._analysis().analyze_texts(texts)
+
+    def _analyze_each(self, texts):
+        """Analyze texts one at a time; returns a (results, exception) pair per text."""
+        metrics = get_metrics()
+        metrics.incr('service.batch_retries')
+        analysis = self._analysis()
+        outcomes = []
+        for text in texts:
+            try:
+                with metrics.timer('analyze'):
+                    outcomes.append((analysis.analyze_text(text), None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
+
+    async def analyze_text(self, text):
+        """Queue a text for the next analysis batch and wait for its results."""
+        future = asyncio.get_running_loop().create_future()
+        # Waits while the queue is full, so slow analysis holds back extraction
+        await self._queue.put((text, future))
+        return await future
+
+    async def analyze_file(self, file_path):
+        """Extract a file's text (OCR on the worker pool) and analyze it."""
+        if not os.path.isfile(file_path):
+            raise RequestError(404, f"File not found: {file_path}")
+        if not is_supported(file_path):
+            raise RequestError(400, f"Unsupported file type: {file_path}")
+        loop = asyncio.get_running_loop()
+        if should_stream(file_path):
+            # Large text files are analyzed chunk by chunk off the batching thread
+            results = await loop.run_in_executor(self._stream_threads, process_stream, file_path, self.filter_file)
+            return results['analysis_results']
+        if file_path.lower().endswith(IMAGE_EXTENSIONS):
+            text, worker_metrics = await loop.run_in_executor(self._ocr_pool, _ocr_task, file_path)
+            get_metrics().merge(worker_metrics)
+        else:
+            text = await loop.run_in_executor(None, extract_text, file_path)
+        if text is None:
+            raise RequestError(422, f"No text extracted from {file_path}")
+        return await self.analyze_text(text)
+
+    async def handle_request(self, payload):
+        """Analyze a request body `{"text": ...}` or `{"path": ...}`; returns the analysis results dict."""
+        if not isinstance(payload, dict):
+            raise RequestError(400, "Request body must be a JSON object")
+        if isinstance(payload.get('text'), str):
+            return await self.analyze_text(payload['text'])
+        if isinstance(payload.get('path'), str):
+            return await self.analyze_file(payload['path'])
+        raise RequestError(400, "Request body needs a 'text' or 'path' string")
+
+    # HTTP
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status, response = await self._dispatch(method, target, body)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except RequestError as e:
+            self._write_response(writer, e.status, {'error': str(e)}, False)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    @staticmethod
+    async def _read_request(reader):
+        """Read one HTTP/1.1 request. Returns (method, target, headers, body) or None at end of stream."""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise RequestError(400, "Malformed request line")
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            raise RequestError(400, "Invalid Content-Length")
+        if length > MAX_REQUEST_BYTES:
+            raise RequestError(413, f"Request body larger than {MAX_REQUEST_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b''
+        return method, target, headers, body
+
+    async def _dispatch(self, method, target, body):
+        path = target.split('?', 1)[0]
+        if path == '/health':
+            return 200, {'status': 'ok', 'pending': self._pending, 'queued': self._queue.qsize()}
+        if path != '/analyze':
+            return 404, {'error': f"Unknown endpoint: {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST"}
+        if self._pending >= self.max_pending:
+            get_metrics().incr('service.rejected')
+            return 503, {'error': "Too many pending requests, retry later"}
+        self._pending += 1
+        started = time.perf_counter()
+        try:
+            payload = json.loads(body or b'null')
+            return 200, await self.handle_request(payload)
+        except json.JSONDecodeError as e:
+            return 400, {'error': f"Invalid JSON: {e}"}
+        except RequestError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            logging.error(f"Error handling request: {e}")
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+        finally:
+            self._pending -= 1
+            get_metrics().record('request', time.perf_counter() - started)
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode('latin-1') + b"\r\n" + body)
+
+
+def main():
+    """Run the analysis service until interrupted."""
+    if os.getenv('METRICS', '0') == '1':
+        enable_metrics()
+    filter_file = os.getenv('FILTERED_WORDS_PATH') or None
+    if filter_file and not os.path.exists(filter_file):
+        logging.error(f"Filtered words file '{filter_file}' does not exist.")
+        return
+    service = AnalysisService(
+        host=os.getenv('SERVICE_HOST', '127.0.0.1'),
+        port=int(os.getenv('SERVICE_PORT', '8765')),
+        filter_file=filter_file,
+        batch_size=int(os.getenv('SERVICE_BATCH_SIZE', '32')),
+        batch_wait=float(os.getenv('SERVICE_BATCH_WAIT_MS', '10')) / 1000,
+        queue_size=int(os.getenv('SERVICE_QUEUE_SIZE', '256')),
+        max_pending=int(os.getenv('SERVICE_MAX_PENDING', '1024')),
+        ocr_workers=int(os.getenv('OCR_WORKERS', '0')) or None,
+        stream_workers=int(os.getenv('SERVICE_STREAM_WORKERS', '1')),
+    )
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        logging.info("Analysis service stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import re
+import json
+import logging
+from collections import Counter
+from analysis_profiles import get_profile
+from language_detector import UNKNOWN_LANGUAGE
+import ngram_stats
+
+DEFAULT_CHUNK_CHARS = 1024 * 1024
+PREVIEW_CHARS = 2000
+
+_SENTENCE_END = re.compile(r'[.!?]\s')
+_STRUCTURAL = re.compile(r'["{}\[\]:,]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+
+
+def iter_text_chunks(file, chunk_chars=DEFAULT_CHUNK_CHARS):
+    """Yield text chunks of about `chunk_chars`, split at sentence or word boundaries."""
+    carry = ''
+    while True:
+        block = file.read(chunk_chars)
+        if not block:
+            break
+        text = carry + block
+        # Prefer the last sentence end, fall back to the last whitespace
+        cut = -1
+        for match in _SENTENCE_END.finditer(text, max(0, len(text) - chunk_chars // 4)):
+            cut = match.end()
+        if cut <= 0:
+            cut = max(text.rfind(' '), text.rfind('\n')) + 1
+        if cut <= 0:
+            cut = len(text)
+        carry = text[cut:]
+        if text[:cut]:
+            yield text[:cut]
+    if carry:
+        yield carry
+
+
+def iter_json_strings(file, chunk_chars=DEFAULT_CHUNK_CHARS):
+    """Yield the string values (not keys) of a JSON or JSON Lines document.
+
+    The document is scanned incrementally, so memory stays bounded by
+    `chunk_chars`; string values longer than that are yielded in pieces.
+    """
+    # An escape sequence (up to \uXXXX) must fit in one read
+    chunk_chars = max(chunk_chars, 6)
+    stack = []
+    expect_key = False
+    buf = ''
+    pos = 0
+    in_string = False
+    is_key = False
+    parts = []
+    size = 0
+
+    def decode(raw_parts):
+        return json.loads('"' + ''.join(raw_parts) + '"')
+
+    while True:
+        if pos >= len(buf):
+            buf = file.read(chunk_chars)
+            pos = 0
+            if not buf:
+                break
+
+        if not in_string:
+            match = _STRUCTURAL.search(buf, pos)
+            if match is None:
+                pos = len(buf)
+                continue
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                in_string = True
+                is_key = expect_key and bool(stack) and stack[-1] == '{'
+                parts = []
+                size = 0
+            elif char in '{[':
+                stack.append(char)
+                expect_key = char == '{'
+            elif char in '}]':
+                if stack:
+                    stack.pop()
+                expect_key = False
+            elif char == ':':
+                expect_key = False
+            else:  # ','
+                expect_key = bool(stack) and stack[-1] == '{'
+            continue
+
+        match = _STRING_SPECIAL.search(buf, pos)
+        end = match.start() if match is not None else len(buf)
+        if not is_key and end - pos > chunk_chars - size:
+            # Take only what fits in the current piece; the rest of the run follows after the flush
+            cut = pos + max(1, chunk_chars - size)
+            parts.append(buf[pos:cut])
+            size += cut - pos
+            pos = cut
+        elif match is None:
+            parts.append(buf[pos:])
+            size += len(buf) - pos
+            pos = len(buf)
+        elif match.group() == '"':
+            parts.append(buf[pos:match.start()])
+            pos = match.end()
+            in_string = False
+            if not is_key:
+                value = decode(parts)
+                if value:
+                    yield value
+            continue
+        else:
+            size += match.start() - pos
+            parts.append(buf[pos:match.start()])
+            # Make sure the whole escape sequence (up to \uXXXX) is in the buffer
+            buf = buf[match.start():]
+            pos = 0
+            while len(buf) < 6:
+                more = file.read(chunk_chars)
+                if not more:
+                    break
+                buf += more
+            length = 6 if buf[1:2] == 'u' else 2
+            parts.append(buf[:length])
+            size += length
+            pos = length
+
+        if size >= chunk_chars and not is_key:
+            # Flush oversized string values in pieces to bound memory, keeping
+            # a trailing high surrogate escape with the low surrogate that follows
+            held = []
+            if parts and parts[-1][:2] == '\\u' and 'd800' <= parts[-1][2:].lower() <= 'dbff':
+                held = [parts.pop()]
+            value = decode(parts)
+            if value:
+                yield value
+            parts = held
+            size = sum(len(part) for part in held)
+
+
+def iter_json_chunks(file, chunk_chars=DEFAULT_CHUNK_CHARS):
+    """Group JSON string values into text chunks of about `chunk_chars`."""
+    pending = []
+    size = 0
+    for value in iter_json_strings(file, chunk_chars):
+        pending.append(value)
+        size += len(value) + 1
+        if size >= chunk_chars:
+            yield '\n'.join(pending)
+            pending = []
+            size = 0
+    if pending:
+        yield '\n'.join(pending)
+
+
+class StreamingStats:
+    """Mergeable per-chunk statistics that add up to an `analyze_text` result."""
+
+    def __init__(self):
+        self.chunks = 0
+        self.sentences = 0
+        self.tokens = 0
+        self.filtered_tokens = 0
+        self.filtered_weight = 0.0
+        self.filter_hits = Counter()
+        self.polarity_sum = 0.0
+        self.subjectivity_sum = 0.0
+        self.sentiment_weight = 0
+        self.pos_tags = []
+        self.language = None
+        self.preview = ''
+
+    def add_chunk(self, analyzer, text, profile=None):
+        """Analyze one chunk of text with a TextAnalyzer and fold it in.
+
+        Only the statistics needed by `profile` (all by default) are computed.
+        """
+        profile = get_profile(profile)
+        doc = analyzer.load_text(text)
+        tokens = len(doc.tokens)
+        self.chunks += 1
+        if 'Sentences' in profile:
+            self.sentences += len(doc.sentences)
+        self.tokens += tokens
+        matches = doc.filtered_tokens(analyzer.filter_words)
+        self.filtered_tokens += len(matches)
+        self.filtered_weight += matches.weight
+        if 'Filter Hits' in profile:
+            self.filter_hits.update(matches)
+        if profile.needs_sentiment:
+            sentiment = analyzer.sentiment_analysis(doc)
+            # Weight chunk sentiment by its token count so the merge approximates the whole text
+            self.polarity_sum += sentiment.polarity * tokens
+            self.subjectivity_sum += sentiment.subjectivity * tokens
+            self.sentiment_weight += tokens
+        if 'POS Tags' in profile and len(self.pos_tags) < 5:
+            self.pos_tags.extend(analyzer.pos_tagging(doc, limit=5 - len(self.pos_tags)))
+        if 'Language' in profile and self.language in (None, UNKNOWN_LANGUAGE) and doc.processed_text.strip():
+            try:
+                self.language = analyzer.language_detection(doc)
+            except Exception as e:
+                logging.error(f"Language detection failed on streamed chunk: {e}")
+        if len(self.preview) < PREVIEW_CHARS:
+            self.preview += text[:PREVIEW_CHARS - len(self.preview)]
+
+    def merge(self, other):
+        """Fold another StreamingStats (e.g. from a later part of the file) into this one."""
+        self.chunks += other.chunks
+        self.sentences += other.sentences
+        self.tokens += other.tokens
+        self.filtered_tokens += other.filtered_tokens
+        self.filtered_weight += other.filtered_weight
+        self.filter_hits.update(other.filter_hits)
+        self.polarity_sum += other.polarity_sum
+        self.subjectivity_sum += other.subjectivity_sum
+        self.sentiment_weight += other.sentiment_weight
+        self.pos_tags = (self.pos_tags + other.pos_tags)[:5]
+        if self.language in (None, UNKNOWN_LANGUAGE):
+            self.language = other.language or self.language
+        self.preview = (self.preview + other.preview)[:PREVIEW_CHARS]
+        return self
+
+    def to_results(self, analysis):
+        """Build the `analyze_text` result dict using the TextAnalysis scoring rules."""
+        polarity = self.polarity_sum / self.sentiment_weight if self.sentiment_weight else 0.0
+        subjectivity = self.subjectivity_sum / self.sentiment_weight if self.sentiment_weight else 0.0
+        vulnerability_score = min(10, (self.filtered_weight / self.tokens) * 10) if self.tokens else 0
+        results = {
+            'Sentences': self.sentences,
+            'Word Tokens': self.tokens,
+            'Filtered Tokens': self.filtered_tokens,
+            'Filter Hits': dict(self.filter_hits),
+            'Vulnerability Score': round(vulnerability_score, 2),
+            'POS Tags': self.pos_tags,
+            'Sentiment': {
+                'Polarity': polarity,
+                'Subjectivity': subjectivity
+            },
+            'Language': self.language,
+            # The score only depends on how many tokens matched, not which
+            'Text Score': analysis.calculate_text_score(range(self.filtered_tokens), polarity,
+                                                         self.filtered_weight)
+        }
+        return {metric: results[metric] for metric in analysis.profile.metrics}
+
+
+def analyze_stream(file_path, analysis, chunk_chars=DEFAULT_CHUNK_CHARS):
+    """Analyze a large .txt, .json or .jsonl file chunk by chunk.
+
+    Returns the same `{'extracted_text', 'analysis_results'}` shape as
+    `process_file`, except that `extracted_text` is a preview of the text.
+    """
+    stats = StreamingStats()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        if file_path.lower().endswith(('.json', '.jsonl')):
+            chunks = iter_json_chunks(file, chunk_chars)
+        else:
+            chunks = iter_text_chunks(file, chunk_chars)
+        for chunk in chunks:
+            stats.add_chunk(analysis.analyzer, chunk, analysis.profile)
+            # N-grams are counted per chunk but the file counts as one document
+            ngram_stats.collect_tokens(analysis.analyzer.doc.tokens, new_document=stats.chunks == 1)
+    logging.info(f"Streamed {stats.chunks} chunks ({stats.tokens} tokens) from {file_path}")
+    return {
+        'extracted_text': stats.preview,
+        'extracted_text_truncated': True,
+        'analysis_results': stats.to_results(analysis)
+    }
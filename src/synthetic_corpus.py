@@ -0,0 +1,111 @@
+import os
+import json
+import random
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+WORDS = (
+    "the of and to in is was for on that with as by at from this be are it an have not or but had his they "
+    "which one you were her all she there would their we him been has when who will more no if out so said "
+    "what up its about into than them can only other new some could time these two may then do first any my "
+    "now such like our over man me even most made after also did many before must through back years where "
+    "much your way well down should because each just those people how too little state good very make world "
+    "still own see men work long get here between both life being under never day same another know while last "
+    "account password login payment urgent verify security update bank transfer invoice customer support"
+).split()
+
+NEGATIVE_WORDS = (
+    "bad terrible awful hate angry fraud scam threat failure broken worse worst poor sad wrong danger "
+    "suspicious unfortunately problem risk loss damage error denied rejected overdue"
+).split()
+
+
+class CorpusGenerator:
+    """Reproducible generator of synthetic text, JSON and rendered-text image documents."""
+
+    def __init__(self, seed=42, negative_ratio=0.05):
+        self.random = random.Random(seed)
+        self.negative_ratio = negative_ratio
+
+    def word(self):
+        if self.random.random() < self.negative_ratio:
+            return self.random.choice(NEGATIVE_WORDS)
+        return self.random.choice(WORDS)
+
+    def sentence(self, min_words=5, max_words=20):
+        words = [self.word() for _ in range(self.random.randint(min_words, max_words))]
+        return ' '.join(words).capitalize() + self.random.choice('...!?')
+
+    def text(self, num_chars):
+        """Text of about `num_chars` characters, split into sentences and paragraphs."""
+        parts = []
+        size = 0
+        while size < num_chars:
+            sentence = self.sentence()
+            if parts and self.random.random() < 0.1:
+                sentence = '\n\n' + sentence
+            parts.append(sentence)
+            size += len(sentence) + 1
+        return ' '.join(parts)
+
+    def json_document(self, num_chars):
+        """A nested JSON-compatible structure holding about `num_chars` characters of text."""
+        records = []
+        size = 0
+        while size < num_chars:
+            message = self.text(self.random.randint(80, 400))
+            records.append({
+                'id': len(records),
+                'author': {'name': self.word().capitalize(), 'verified': self.random.random() < 0.5},
+                'message': message,
+                'tags': [self.word() for _ in range(self.random.randint(0, 4))],
+                'score': round(self.random.random(), 3),
+            })
+            size += len(message)
+        return {'records': records, 'count': len(records)}
+
+    def image(self, width=1200, height=900, lines=12):
+        """A white image with black rendered text lines; returns a BGR array."""
+        import cv2
+        import numpy as np
+        img = np.full((height, width, 3), 255, dtype=np.uint8)
+        line_height = max(20, height // (lines + 1))
+        for i in range(lines):
+            words = [self.word() for _ in range(self.random.randint(3, 9))]
+            x = self.random.randint(10, max(11, width // 5))
+            y = (i + 1) * line_height
+            scale = self.random.uniform(0.6, 1.1)
+            cv2.putText(img, ' '.join(words), (x, y), cv2.FONT_HERSHEY_SIMPLEX, scale, (0, 0, 0), 2, cv2.LINE_AA)
+        return img
+
+    def write_corpus(self, directory, text_docs=20, json_docs=10, image_docs=5, doc_chars=5000,
+                     image_size=(1200, 900)):
+        """Write a corpus of .txt, .json and .png files and return their paths."""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for i in range(text_docs):
+            path = os.path.join(directory, f"doc_{i:05d}.txt")
+            with open(path, 'w', encoding='utf-8') as file:
+                file.write(self.text(doc_chars))
+            paths.append(path)
+        for i in range(json_docs):
+            path = os.path.join(directory, f"data_{i:05d}.json")
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(self.json_document(doc_chars), file)
+            paths.append(path)
+        if image_docs:
+            import cv2
+            for i in range(image_docs):
+                path = os.path.join(directory, f"screenshot_{i:05d}.png")
+                cv2.imwrite(path, self.image(*image_size))
+                paths.append(path)
+        logging.info(f"Generated {len(paths)} synthetic documents in {directory}")
+        return paths
+
+    def write_lexicon(self, path):
+        """Write a filter-word file matching the negative vocabulary."""
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(NEGATIVE_WORDS) + '\n')
+        return path
@@ -1,54 +1,91 @@
 from text_analyzer import TextAnalyzer
+from metrics import get_metrics
+from analysis_profiles import get_profile
 
 class TextAnalysis:
-    def __init__(self, filter_file=None):
-        self.analyzer = TextAnalyzer(filter_file)
+    def __init__(self, filter_file=None, analyzer=None, profile=None):
+        # Profile selects which metrics analyze_text computes ('full' by default)
+        self.profile = get_profile(profile)
+        self.analyzer = analyzer or TextAnalyzer(filter_file, tokenizer=self.profile.tokenizer,
+                                                 sentiment_engine=self.profile.sentiment_engine,
+                                                 language_detector=self.profile.language_detector)
         self.filter_words = self.analyzer.filter_words  # Use filter words loaded in TextAnalyzer
 
-    def calculate_text_score(self, filtered_tokens, sentiment_score):
-        """Calculate a score based on the occurrence of filtered words and their sentiment."""
+    def calculate_text_score(self, filtered_tokens, sentiment_score, weight=None):
+        """Calculate a score based on the occurrence of filtered words and their sentiment.
+
+        Matches count by their lexicon weight (`filtered_tokens.weight`, or `weight`); with
+        the default weight of 1 per term this is the plain match count.
+        """
         if not filtered_tokens:
             return 0
+        if weight is None:
+            weight = getattr(filtered_tokens, 'weight', len(filtered_tokens))
 
         # Calculate average sentiment of filtered tokens
         average_sentiment = sentiment_score / len(filtered_tokens) if filtered_tokens else 0
         
         # Calculate text score
-        text_score = min(10, (len(filtered_tokens) * average_sentiment) * 10)  # Scale to 1-10
+        text_score = min(10, (weight * average_sentiment) * 10)  # Scale to 1-10
         
         return round(text_score, 2)
 
     def analyze_text(self, text):
-        """Perform comprehensive text analysis and return results."""
-        self.analyzer.load_text(text)
+        """Perform text analysis and return the metrics selected by the profile."""
+        # Tokenize and sentence-split once; every metric below reuses the document
+        return self._analyze_document(self.analyzer.load_text(text))
+
+    def analyze_texts(self, texts):
+        """Analyze many texts, scoring their sentiment in one batch; returns one result per text."""
+        docs = [self.analyzer.load_text(text) for text in texts]
+        if self.profile.needs_sentiment and self.analyzer.sentiment_engine == 'lexicon' and docs:
+            with get_metrics().timer('sentiment_batch'):
+                self.analyzer.sentiment_batch(docs)
+        return [self._analyze_document(doc) for doc in docs]
 
-        tokens = self.analyzer.word_tokenization()
-        filtered_tokens = [t for t in tokens if t in self.filter_words]
+    def _analyze_document(self, doc):
+        metrics = get_metrics()
+        profile = self.profile
+        results = {}
+
+        if 'Sentences' in profile:
+            with metrics.timer('tokenize'):
+                results['Sentences'] = len(doc.sentences)
+        with metrics.timer('tokenize'):
+            tokens = doc.tokens
+        with metrics.timer('filter'):
+            filtered_tokens = doc.filtered_tokens(self.filter_words)
         num_filtered_tokens = len(filtered_tokens)
 
-        # Calculate sentiment of filtered tokens
-        filtered_text = ' '.join(filtered_tokens)
-        sentiment = self.analyzer.sentiment_analysis()
-        sentiment_score = sentiment.polarity
+        if 'Word Tokens' in profile:
+            results['Word Tokens'] = len(tokens)
+        if 'Filtered Tokens' in profile:
+            results['Filtered Tokens'] = num_filtered_tokens
+        if 'Filter Hits' in profile:
+            results['Filter Hits'] = filtered_tokens.counts()
+        if 'Vulnerability Score' in profile:
+            # Calculate vulnerability score (scale of 10), weighting each match by its lexicon weight
+            vulnerability_score = min(10, (filtered_tokens.weight / len(tokens)) * 10) if tokens else 0
+            results['Vulnerability Score'] = round(vulnerability_score, 2)
+        if 'POS Tags' in profile:
+            with metrics.timer('pos'):
+                results['POS Tags'] = self.analyzer.pos_tagging(doc, limit=5)  # Tag only the first 5 tokens
 
-        # Calculate vulnerability score (scale of 10)
-        vulnerability_score = min(10, (num_filtered_tokens / len(tokens)) * 10) if tokens else 0
+        if profile.needs_sentiment:
+            # Calculate sentiment of the text
+            with metrics.timer('sentiment'):
+                sentiment = self.analyzer.sentiment_analysis(doc)
+            if 'Sentiment' in profile:
+                results['Sentiment'] = {
+                    'Polarity': sentiment.polarity,
+                    'Subjectivity': sentiment.subjectivity
+                }
 
-        # Calculate text score
-        text_score = self.calculate_text_score(filtered_tokens, sentiment_score)
-
-        results = {
-            'Sentences': len(self.analyzer.sentence_splitting()),
-            'Word Tokens': len(tokens),
-            'Filtered Tokens': num_filtered_tokens,
-            'Vulnerability Score': round(vulnerability_score, 2),
-            'POS Tags': self.analyzer.pos_tagging()[:5],  # Show first 5 POS tags
-            'Sentiment': {
-                'Polarity': sentiment.polarity,
-                'Subjectivity': sentiment.subjectivity
-            },
-            'Language': self.analyzer.language_detection(),
-            'Text Score': text_score  # Add text score based on filtered words
-        }
+        if 'Language' in profile:
+            with metrics.timer('language'):
+                results['Language'] = self.analyzer.language_detection(doc)
+        if 'Text Score' in profile:
+            # Add text score based on filtered words
+            results['Text Score'] = self.calculate_text_score(filtered_tokens, sentiment.polarity)
 
         return results
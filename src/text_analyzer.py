@@ -1,96 +1,151 @@
-import nltk
-import spacy
-from textblob import TextBlob
-from langdetect import detect
-from nltk.tokenize import word_tokenize
-from nltk.collocations import BigramCollocationFinder, TrigramCollocationFinder
-from nltk.metrics import BigramAssocMeasures, TrigramAssocMeasures
-import logging
+from document import ParsedDocument
+from filter_matcher import FilterMatcher, load_matcher
+
+# nltk, spacy, textblob and langdetect are imported by the methods that need them,
+# so importing this module and running lightweight profiles stays fast
+
+def _load_spacy_model(model_name):
+    import spacy
+    return spacy.load(model_name)
 
 class TextAnalyzer:
-    def __init__(self, filter_file=None):
-        # Initialize NLP models
-        self.nlp = spacy.load('en_core_web_sm')
+    def __init__(self, filter_file=None, model_name='en_core_web_sm', filter_words=None, model_loader=None,
+                 tokenizer='treebank', sentiment_engine='textblob', language_detector='langdetect'):
+        # NLP models are loaded lazily on first use of `nlp`
+        self.model_name = model_name
+        self._model_loader = model_loader or _load_spacy_model
+        self.tokenizer = tokenizer
+        self.sentiment_engine = sentiment_engine
+        self.language_detector = language_detector
+        self._nlp = None
         self.text = ""
         self.processed_text = ""
-        self.filter_words = self._load_filter_words(filter_file) if filter_file else set()
+        self.doc = None
+        if isinstance(filter_words, FilterMatcher):
+            self.filter_words = filter_words
+        elif filter_words is not None:
+            self.filter_words = FilterMatcher.from_words(filter_words)
+        else:
+            self.filter_words = self._load_filter_words(filter_file) if filter_file else FilterMatcher()
 
-    def _load_filter_words(self, filter_file):
-        """Load filter words from a text file."""
-        filter_words = set()
-        try:
-            with open(filter_file, 'r', encoding='utf-8') as file:
-                for line in file:
-                    filter_words.add(line.strip().lower())  # Add each word to the set
-        except Exception as e:
-            logging.error(f"Error loading filter words from {filter_file}: {e}")
-        return filter_words
+    @property
+    def nlp(self):
+        """Return the spaCy model, loading it on first access."""
+        if self._nlp is None:
+            self._nlp = self._model_loader(self.model_name)
+        return self._nlp
+
+    @staticmethod
+    def _load_filter_words(filter_file):
+        """Load the compiled filter matcher for a lexicon file (shared and cached by content)."""
+        return load_matcher(filter_file)
 
     def load_text(self, text):
         """Load text for processing."""
         self.text = text
-        self.processed_text = self.text.lower()
-
-    def sentence_splitting(self):
+        self.doc = ParsedDocument(text, self.tokenizer)
+        self.processed_text = self.doc.processed_text
+        return self.doc
+
+    def _doc(self, doc):
+        """Return the given document or the one built by `load_text`."""
+        if doc is not None:
+            return doc
+        if self.doc is None:
+            self.load_text(self.text)
+        return self.doc
+
+    def sentence_splitting(self, doc=None):
         """Split text into sentences."""
-        sentences = nltk.sent_tokenize(self.processed_text)
-        return [s.lower() for s in sentences]
+        return list(self._doc(doc).sentences)
 
-    def word_tokenization(self):
+    def word_tokenization(self, doc=None):
         """Tokenize text into words."""
-        tokens = word_tokenize(self.processed_text)
-        return [t.lower() for t in tokens]
+        return list(self._doc(doc).tokens)
+
+    def pos_tagging(self, doc=None, limit=None):
+        """Tag parts of speech in the text, only for the first `limit` tokens when given."""
+        return list(self._doc(doc).pos_tags(limit))
 
-    def pos_tagging(self):
-        """Tag parts of speech in the text."""
-        tokens = self.word_tokenization()
-        return nltk.pos_tag(tokens)
+    def _bigram_finder(self, doc):
+        from nltk.collocations import BigramCollocationFinder
+        return doc.memo('bigram_finder', lambda: BigramCollocationFinder.from_words(doc.tokens))
 
-    def bigram_analysis(self):
+    def bigram_analysis(self, doc=None):
         """Analyze bigrams in the text."""
-        tokens = self.word_tokenization()
-        bigram_finder = BigramCollocationFinder.from_words(tokens)
+        from nltk.metrics import BigramAssocMeasures
+        bigram_finder = self._bigram_finder(self._doc(doc))
         return bigram_finder.nbest(BigramAssocMeasures.likelihood_ratio, 10)
 
-    def trigram_analysis(self):
+    def trigram_analysis(self, doc=None):
         """Analyze trigrams in the text."""
-        tokens = self.word_tokenization()
-        trigram_finder = TrigramCollocationFinder.from_words(tokens)
+        from nltk.collocations import TrigramCollocationFinder
+        from nltk.metrics import TrigramAssocMeasures
+        doc = self._doc(doc)
+        trigram_finder = doc.memo('trigram_finder', lambda: TrigramCollocationFinder.from_words(doc.tokens))
         return trigram_finder.nbest(TrigramAssocMeasures.likelihood_ratio, 10)
 
-    def collocations(self):
+    def collocations(self, doc=None):
         """Identify word collocations."""
-        tokens = self.word_tokenization()
-        bigram_finder = BigramCollocationFinder.from_words(tokens)
+        from nltk.metrics import BigramAssocMeasures
+        bigram_finder = self._bigram_finder(self._doc(doc))
         return bigram_finder.nbest(BigramAssocMeasures.likelihood_ratio, 10)
 
-    def concordance(self, word):
+    def concordance(self, word, doc=None):
         """Find occurrences of a word within its context."""
-        text = nltk.Text(self.word_tokenization())
+        import nltk
+        doc = self._doc(doc)
+        text = doc.memo('nltk_text', lambda: nltk.Text(doc.tokens))
         return text.concordance(word)
 
-    def sentiment_analysis(self):
+    def sentiment_analysis(self, doc=None):
         """Analyze the sentiment of the text."""
-        blob = TextBlob(self.processed_text)
-        return blob.sentiment
-
-    def language_detection(self):
-        """Detect the language of the text."""
-        return detect(self.processed_text)
+        doc = self._doc(doc)
+        if self.sentiment_engine == 'lexicon':
+            return doc.memo('lexicon_sentiment', lambda: self.sentiment_batch([doc])[0])
+        return doc.sentiment
+
+    def sentiment_batch(self, docs):
+        """Sentiment of many documents; the 'lexicon' engine scores them in one vectorized pass."""
+        if self.sentiment_engine != 'lexicon':
+            return [doc.sentiment for doc in docs]
+        from batch_sentiment import get_batch_sentiment
+        sentiments = get_batch_sentiment().score([doc.tokens for doc in docs])
+        # Memoize on each document so sentiment_analysis reuses the batch result
+        return [doc.memo('lexicon_sentiment', lambda s=s: s) for doc, s in zip(docs, sentiments)]
+
+    def language_detection(self, doc=None):
+        """Detect the language of the text; 'unknown' when it has no usable features."""
+        from language_detector import UNKNOWN_LANGUAGE, get_language_detector
+        text = self._doc(doc).processed_text
+        if self.language_detector == 'profile':
+            return get_language_detector().detect(text)
+        from langdetect import DetectorFactory, detect
+        from langdetect.lang_detect_exception import LangDetectException
+        DetectorFactory.seed = 0  # langdetect samples n-grams at random; a fixed seed makes it repeatable
+        try:
+            return detect(text)
+        except LangDetectException:
+            return UNKNOWN_LANGUAGE
 
-    def score_text(self):
+    def score_text(self, doc=None):
         """Calculate a score based on filtered words and sentiment analysis."""
-        tokens = self.word_tokenization()
-        filtered_tokens = [t for t in tokens if t in self.filter_words]
-        num_filtered_tokens = len(filtered_tokens)
+        doc = self._doc(doc)
+        tokens = doc.tokens
+        filtered_tokens = doc.filtered_tokens(self.filter_words)
 
         # Calculate vulnerability score (scale of 10)
-        vulnerability_score = min(10, (num_filtered_tokens / len(tokens)) * 10) if tokens else 0
+        vulnerability_score = min(10, (filtered_tokens.weight / len(tokens)) * 10) if tokens else 0
 
         # Perform sentiment analysis on the filtered tokens
         if filtered_tokens:
-            filtered_text = ' '.join(filtered_tokens)
-            sentiment = TextBlob(filtered_text).sentiment.polarity
+            filtered_text = ' '.join(filtered_tokens)  # Matched terms, including multi-word phrases
+            if self.sentiment_engine == 'lexicon':
+                from batch_sentiment import get_batch_sentiment
+                sentiment = get_batch_sentiment().score([filtered_text.split()])[0].polarity
+            else:
+                from textblob import TextBlob
+                sentiment = TextBlob(filtered_text).sentiment.polarity
             # Sentiment score on a scale of 1-10
             sentiment_score = round((sentiment + 1) * 4.5)  # -1 maps to 1, 1 maps to 10
         else:
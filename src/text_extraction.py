@@ -1,14 +1,55 @@
 import os
+import time
 import cv2
 from PIL import Image
 import pytesseract
 import logging
-from io import BytesIO
+from region_planner import plan_regions, min_area_for
+from phash_index import mask_hashes
+from metrics import get_metrics
+from image_preprocessing import PREPROCESS_ENGINES, DEFAULT_PREPROCESS_ENGINE, get_preprocessor
+
+OCR_MODES = ('per_box', 'single_pass')
 
 class TextExtractor:
-    def __init__(self, tesseract_path=None):
+    def __init__(self, tesseract_path=None, mode=None, plan_regions=True, phash_index=None, preprocess_engine=None,
+                 preprocessor=None):
         if tesseract_path:
             pytesseract.pytesseract.tesseract_cmd = tesseract_path
+        # 'per_box' runs tesseract on each region; 'single_pass' runs it once per image
+        self.mode = mode or os.getenv('OCR_MODE', 'per_box')
+        if self.mode not in OCR_MODES:
+            raise ValueError(f"Unknown OCR mode: {self.mode}")
+        # Merge, de-nest and order regions before OCR; off restores the raw contour boxes
+        self.plan_regions = plan_regions
+        self.last_plan_stats = None
+        # Optional PHashIndex reusing OCR results of near-duplicate images
+        self.phash_index = phash_index
+        # 'fast' decodes grayscale and only downscales (ImagePreprocessor); 'legacy' keeps the 800 px color pipeline
+        self.preprocess_engine = preprocess_engine or DEFAULT_PREPROCESS_ENGINE
+        if self.preprocess_engine not in PREPROCESS_ENGINES:
+            raise ValueError(f"Unknown preprocessing engine: {self.preprocess_engine}")
+        self.preprocessor = None
+        if self.preprocess_engine == 'fast':
+            self.preprocessor = preprocessor or get_preprocessor()
+
+    def _ocr_config(self):
+        config = {
+            'tesseract_cmd': pytesseract.pytesseract.tesseract_cmd,
+            'max_size': 800,
+            'mode': self.mode,
+            'plan_regions': self.plan_regions,
+        }
+        if self.preprocessor is not None:
+            config['max_size'] = self.preprocessor.max_side
+            config['preprocess'] = self.preprocessor.config()
+        return config
+
+    def config(self):
+        """Settings that affect the extracted text, used to key cached results."""
+        config = self._ocr_config()
+        config['phash_max_distance'] = self.phash_index.max_distance if self.phash_index is not None else None
+        return config
 
     def _resize_image(self, img, max_size=800):
         height, width = img.shape[:2]
@@ -28,41 +69,131 @@ class TextExtractor:
         contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         if not contours:
             return []
-        min_contour_area = 500
+        # Scale the area threshold with the image when planning regions
+        min_contour_area = min_area_for(thresh.shape) if self.plan_regions else 500
         filtered_contours = [cnt for cnt in contours if cv2.contourArea(cnt) > min_contour_area]
         return filtered_contours
 
+    @staticmethod
+    def _to_pil(img):
+        if img.ndim == 2:
+            return Image.fromarray(img)
+        return Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+
     def _extract_text_area(self, img, x, y, w, h):
+        # Hand the crop to tesseract in memory; no lossy JPEG round-trip
         card = img[y:y + h, x:x + w]
-        _, img_encoded = cv2.imencode('.jpg', card)
-        img_bytes = BytesIO(img_encoded.tobytes())
-        text = pytesseract.image_to_string(Image.open(img_bytes))
+        text = pytesseract.image_to_string(self._to_pil(card))
         return text
 
-    def process_image(self, file_path):
-        try:
+    def _extract_text_single_pass(self, img, boxes):
+        """OCR the whole image once and assign recognized words to the boxes containing them."""
+        data = pytesseract.image_to_data(self._to_pil(img), output_type=pytesseract.Output.DICT)
+        lines = [{} for _ in boxes]
+        for i, word in enumerate(data['text']):
+            if not word or not word.strip() or float(data['conf'][i]) < 0:
+                continue
+            cx = data['left'][i] + data['width'][i] / 2
+            cy = data['top'][i] + data['height'][i] / 2
+            for index, (x, y, w, h) in enumerate(boxes):
+                if x <= cx < x + w and y <= cy < y + h:
+                    line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+                    lines[index].setdefault(line_key, []).append(word)
+                    break
+        # Lines keep tesseract's reading order because dicts preserve insertion order
+        return ["\n".join(" ".join(words) for words in box_lines.values()) for box_lines in lines]
+
+    def _timed_extract_text_area(self, metrics, img, box):
+        with metrics.timer('ocr_region'):
+            return self._extract_text_area(img, *box)
+
+    def _load(self, file_path):
+        """Decode and scale an image with the configured engine. Returns None if unreadable."""
+        metrics = get_metrics()
+        if self.preprocessor is not None:
+            return self.preprocessor.load_scaled(file_path)
+        with metrics.timer('read'):
             img = cv2.imread(file_path)
-            if img is None:
+        if img is None:
+            return None
+        with metrics.timer('resize'):
+            return self._resize_image(img)
+
+    def _binarize(self, img):
+        if self.preprocessor is not None:
+            return self.preprocessor.binarize(img)
+        with get_metrics().timer('preprocess'):
+            return self._preprocess_image(img)
+
+    def process_image(self, file_path, prepared=None):
+        """Find text regions in an image and OCR them.
+
+        `prepared` may be a PreprocessedImage from `ImagePreprocessor.prepare`.
+        Per image, decoding through contour detection is recorded as 'image_preprocess'
+        and all OCR calls as 'image_ocr'.
+        """
+        try:
+            metrics = get_metrics()
+            binary = None
+            if prepared is not None:
+                img_resized, binary, preprocess_seconds = prepared
+            else:
+                started = time.perf_counter()
+                img_resized = self._load(file_path)
+                preprocess_seconds = time.perf_counter() - started
+            if img_resized is None:
                 logging.error(f"Unable to read image file: {file_path}")
                 return
 
-            img_resized = self._resize_image(img)
-            thresh = self._preprocess_image(img_resized)
-            contours = self._find_contours(thresh)
+            started = time.perf_counter()
+            thresh = binary if binary is not None else self._binarize(img_resized)
+            with metrics.timer('contours'):
+                contours = self._find_contours(thresh)
+            metrics.record('image_preprocess', preprocess_seconds + time.perf_counter() - started)
 
             if not contours:
                 logging.info("No significant text areas found.")
                 return
 
-            results = []
-            for contour in contours:
-                x, y, w, h = cv2.boundingRect(contour)
-                text = self._extract_text_area(img_resized, x, y, w, h)
-                results.append({
-                    'box': (x, y, w, h),
-                    'text': text
-                })
-                logging.info(f"Extracted text from box ({x}, {y}, {w}, {h}): {text}")
+            boxes = [cv2.boundingRect(contour) for contour in contours]
+            if self.plan_regions:
+                # Contours are already filtered by area, so the planner keeps every box
+                boxes, self.last_plan_stats = plan_regions(boxes, img_resized.shape, min_area_ratio=0)
+                metrics.incr('ocr.calls_saved', self.last_plan_stats['ocr_calls_saved'])
+                logging.info(
+                    f"Planned {self.last_plan_stats['regions']} regions from {self.last_plan_stats['candidates']} "
+                    f"text areas in {file_path} ({self.last_plan_stats['ocr_calls_saved']} OCR calls saved)"
+                )
+
+            if self.phash_index is not None:
+                # Hashed on the text mask and the planned regions, so only OCR itself is skipped on a hit
+                height, width = thresh.shape[:2]
+                with metrics.timer('phash_lookup'):
+                    image_hash, region_hashes = mask_hashes(thresh, boxes)
+                    cached = self.phash_index.lookup(image_hash, width, height, self._ocr_config(), boxes,
+                                                     region_hashes)
+                if cached is not None:
+                    metrics.incr('phash.hit')
+                    logging.info(f"Reusing OCR results of a near-duplicate image for {file_path}")
+                    return cached
+                metrics.incr('phash.miss')
+            with metrics.timer('image_ocr'):
+                if self.mode == 'single_pass':
+                    with metrics.timer('ocr_single_pass'):
+                        texts = self._extract_text_single_pass(img_resized, boxes)
+                else:
+                    texts = (self._timed_extract_text_area(metrics, img_resized, box) for box in boxes)
+
+                results = []
+                for (x, y, w, h), text in zip(boxes, texts):
+                    results.append({
+                        'box': (x, y, w, h),
+                        'text': text
+                    })
+                    logging.debug(f"Extracted text from box ({x}, {y}, {w}, {h}): {text}")
+
+            if self.phash_index is not None:
+                self.phash_index.add(image_hash, width, height, self._ocr_config(), results, region_hashes)
 
             # Ensure no image display code is present
             # cv2.imshow("Detected Regions", img_resized)
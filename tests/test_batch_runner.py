@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import multiprocessing
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import batch_runner
+from ledger import close_ledgers
+
+# Workers must inherit the patched process_file below
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != 'fork', reason='needs fork workers')
+
+
+class ListWriter:
+    def __init__(self):
+        self.written = []
+
+    def write(self, file_path, results):
+        self.written.append(os.path.basename(file_path))
+
+    def flush(self):
+        pass
+
+    def bind_ledger(self, ledger):
+        pass
+
+
+def fake_process_file(file_path, filter_file=None, cache=None):
+    name = os.path.basename(file_path)
+    if name == 'boom.txt':
+        os._exit(1)
+    time.sleep(1.0 if name == 'slow.txt' else 0.1)
+    return {'extracted_text': name}
+
+
+def test_only_the_file_that_crashes_a_worker_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_runner, 'process_file', fake_process_file)
+    monkeypatch.setattr(batch_runner.analyzer_pool, 'warm_up', lambda **kwargs: None)
+    names = ['slow.txt', 'boom.txt', 'a.txt', 'b.txt', 'c.txt']
+    paths = []
+    for name in names:
+        path = tmp_path / name
+        path.write_text(name, encoding='utf-8')
+        paths.append(str(path))
+    writer = ListWriter()
+    runner = batch_runner.BatchRunner(str(tmp_path / 'out'), str(tmp_path / 'ledger.sqlite3'), workers=2,
+                                      max_in_flight=4, writer=writer)
+    try:
+        summary = runner.run(paths)
+    finally:
+        close_ledgers()
+    # The long file submitted first was in flight when the pool broke, but is not blamed for it
+    assert summary['failed'] == 1 and summary['processed'] == 4
+    assert sorted(writer.written) == ['a.txt', 'b.txt', 'c.txt', 'slow.txt']
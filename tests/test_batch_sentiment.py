@@ -0,0 +1,55 @@
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+pytest.importorskip('numpy')
+textblob = pytest.importorskip('textblob')
+
+from batch_sentiment import BatchSentiment
+
+CASES = [
+    'This movie is good.',
+    'This movie is not good.',
+    'This movie is very good.',
+    'This movie is not very good.',
+    'The food was really very bad.',
+    'I do not like it, it is never bad.',
+    'This movie is good!',
+    'This movie is good!!',
+    'What a terrible, awful day!',
+    'Nothing here.',
+]
+
+
+def tokenize(text):
+    return re.findall(r"\w+|[^\w\s]", text.lower())
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return BatchSentiment()
+
+
+def test_batch_scores_match_textblob(engine):
+    # All documents are scored together, so negation and intensifier scope must not leak between them
+    scores = engine.score([tokenize(text) for text in CASES])
+    for text, score in zip(CASES, scores):
+        expected = textblob.TextBlob(text).sentiment
+        assert score.polarity == pytest.approx(expected.polarity, abs=1e-9), text
+        assert score.subjectivity == pytest.approx(expected.subjectivity, abs=1e-9), text
+
+
+def test_negation_intensifier_and_exclamation(engine):
+    good, not_good, very_good, not_very_good, exclaimed = engine.score(
+        [tokenize(text) for text in ('good', 'not good', 'very good', 'not very good', 'good!')])
+    assert not_good.polarity == pytest.approx(-0.5 * good.polarity)
+    assert very_good.polarity > good.polarity > not_very_good.polarity
+    assert exclaimed.polarity == pytest.approx(min(1.0, good.polarity * 1.25))
+
+
+def test_empty_documents(engine):
+    assert engine.score([[], ['nothing']]) == [(0.0, 0.0), (0.0, 0.0)]
@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from filter_matcher import FilterMatcher, load_matcher, parse_lexicon
+
+
+def test_longest_term_wins_at_the_same_start():
+    matcher = FilterMatcher.from_words(['good', 'not', 'not good', 'new', 'new york', 'new york city'])
+    assert matcher.match('this is not good'.split()) == ['not good']
+    assert matcher.match('i love new york city'.split()) == ['new york city']
+    assert matcher.match('new york is not new'.split()) == ['new york', 'not', 'new']
+
+
+def test_leftmost_match_wins_over_an_overlapping_one():
+    matcher = FilterMatcher.from_words(['a b', 'b c d', 'c'])
+    # "b c d" overlaps "a b", which starts first; "c" is then reached through a failure link
+    assert matcher.match('a b c d'.split()) == ['a b', 'c']
+    assert matcher.match('b c e'.split()) == ['c']
+    assert matcher.match('x b c d'.split()) == ['b c d']
+
+
+def test_single_words_match_whole_tokens_only():
+    matcher = FilterMatcher.from_words(['bad'])
+    assert matcher.match(['badly', 'bad', 'bad']) == ['bad', 'bad']
+    assert matcher.match([]) == [] and matcher.match([]).weight == 0.0
+
+
+def test_weighted_lexicon():
+    terms = parse_lexicon(['Awful\t2.5', 'not good\t1.5', '', 'bad', 'broken\tn/a'])
+    assert terms == {'awful': 2.5, 'not good': 1.5, 'bad': 1.0, 'broken\tn/a': 1.0}
+    matcher = FilterMatcher(terms)
+    matches = matcher.match('awful and not good and awful and bad'.split())
+    assert matches == ['awful', 'not good', 'awful', 'bad']
+    assert matches.weight == 2.5 + 1.5 + 2.5 + 1.0
+    assert matches.counts() == {'awful': 2, 'not good': 1, 'bad': 1}
+    assert matcher.weight('not good') == 1.5
+    # Unweighted matches count one each
+    assert FilterMatcher.from_words(['bad']).match(['bad', 'bad']).weight == 2.0
+
+
+def test_compiled_matcher_round_trips_through_the_cache(tmp_path):
+    lexicon = tmp_path / 'lexicon.txt'
+    lexicon.write_text('not good\t2\ngood\nvery bad\t3\n', encoding='utf-8')
+    tokens = 'not good and very bad but good'.split()
+    compiled = load_matcher(str(lexicon), cache_dir=str(tmp_path / 'cache'))
+    assert len(os.listdir(tmp_path / 'cache')) == 1
+    restored = FilterMatcher.from_dict(compiled.to_dict())
+    assert restored.match(tokens) == compiled.match(tokens) == ['not good', 'very bad', 'good']
+    assert restored.match(tokens).weight == compiled.match(tokens).weight == 6.0
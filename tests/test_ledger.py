@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from ledger import ProcessedLedger, open_ledger, close_ledgers
+
+
+def make_file(path, text='text'):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_legacy_basenames_are_migrated_once(tmp_path):
+    legacy_log = tmp_path / 'processed_files.json'
+    legacy_log.write_text(json.dumps(['a.txt', 'b.png', 42]), encoding='utf-8')
+    first = make_file(tmp_path / 'in' / 'a.txt')
+    second = make_file(tmp_path / 'in' / 'sub' / 'a.txt')
+    try:
+        ledger = open_ledger(str(legacy_log))
+        assert ledger.path == str(tmp_path / 'processed_files.sqlite3')
+        # The first path with a legacy basename takes the entry over; later ones are new files
+        assert ledger.is_processed(first)
+        assert not ledger.is_processed(second)
+        assert ledger.migrate_json(str(legacy_log)) == 0
+    finally:
+        close_ledgers()
+
+    with ProcessedLedger(str(tmp_path / 'processed_files.sqlite3')) as ledger:
+        assert ledger.is_processed(first)
+        assert not ledger.is_processed(second)
+        # Migration is recorded, so an edited legacy log is not imported again
+        legacy_log.write_text(json.dumps(['a.txt']), encoding='utf-8')
+        assert ledger.migrate_json(str(legacy_log)) == 0
+        assert not ledger.is_processed(second)
+
+
+def test_is_unchanged_compares_scan_size_and_mtime(tmp_path):
+    path = make_file(tmp_path / 'doc.txt')
+    with ProcessedLedger(str(tmp_path / 'ledger.sqlite3')) as ledger:
+        stat = os.stat(path)
+        assert not ledger.is_unchanged(path, stat.st_size, stat.st_mtime_ns)
+        ledger.mark_processed(path)
+        assert ledger.is_unchanged(path, stat.st_size, stat.st_mtime_ns)
+        assert not ledger.is_unchanged(path, stat.st_size + 1, stat.st_mtime_ns)
+        assert not ledger.is_unchanged(path, stat.st_size, stat.st_mtime_ns + 1)
+
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert not ledger.is_processed(path)
+        changed = os.stat(path)
+        assert not ledger.is_unchanged(path, changed.st_size, changed.st_mtime_ns)
+
+
+def test_hash_mode_ignores_touched_files(tmp_path):
+    path = make_file(tmp_path / 'doc.txt')
+    with ProcessedLedger(str(tmp_path / 'ledger.sqlite3'), key_mode='hash') as ledger:
+        ledger.mark_processed(path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        assert ledger.is_processed(path)
+        make_file(tmp_path / 'doc.txt', 'changed')
+        assert not ledger.is_processed(path)
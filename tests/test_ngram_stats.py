@@ -0,0 +1,83 @@
+import os
+import sys
+import random
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+pytest.importorskip('numpy')
+
+from ngram_stats import NgramStats
+
+
+def corpus(seed=1, documents=4, length=500):
+    rng = random.Random(seed)
+    vocab = 'the cat sat on a mat in new york city with one dog that ran'.split()
+    return [[rng.choice(vocab) for _ in range(length)] for _ in range(documents)]
+
+
+def assert_same_ranking(ours, theirs):
+    assert [ngram for ngram, _, _ in ours] == [ngram for ngram, _ in theirs]
+    for (_, score, _), (_, expected) in zip(ours, theirs):
+        assert score == pytest.approx(expected, rel=1e-9)
+
+
+def test_exact_scores_match_nltk():
+    collocations = pytest.importorskip('nltk.collocations')
+    from nltk.metrics import BigramAssocMeasures, TrigramAssocMeasures
+    tokens = corpus(documents=1, length=2000)[0]
+    stats = NgramStats('exact')
+    stats.add_tokens(tokens)
+    bigrams = collocations.BigramCollocationFinder.from_words(tokens)
+    trigrams = collocations.TrigramCollocationFinder.from_words(tokens)
+    assert_same_ranking(stats.top_bigrams(15), bigrams.score_ngrams(BigramAssocMeasures.likelihood_ratio)[:15])
+    assert_same_ranking(stats.top_trigrams(15), trigrams.score_ngrams(TrigramAssocMeasures.likelihood_ratio)[:15])
+
+
+def test_merged_worker_counts_equal_a_single_pass():
+    documents = corpus()
+    single = NgramStats('exact')
+    for tokens in documents:
+        single.add_tokens(tokens)
+    left, right = NgramStats('exact'), NgramStats('exact')
+    for tokens in documents[:2]:
+        left.add_tokens(tokens)
+    for tokens in documents[2:]:
+        right.add_tokens(tokens)
+    merged = left.merge(right)
+    assert merged.documents == 4 and merged.tokens == single.tokens
+    assert merged.report(10) == single.report(10)
+
+
+def test_sketch_save_load_and_merge(tmp_path):
+    documents = corpus()
+    exact = NgramStats('exact')
+    halves = [NgramStats('sketch', width=1 << 14, capacity=2000) for _ in range(2)]
+    for i, tokens in enumerate(documents):
+        exact.add_tokens(tokens)
+        halves[i % 2].add_tokens(tokens)
+
+    path = str(tmp_path / 'stats.json.gz')
+    halves[0].save(path)
+    loaded = NgramStats.load(path)
+    assert loaded.is_sketch and loaded.to_dict() == halves[0].to_dict()
+
+    merged = loaded.merge(halves[1])
+    assert merged.documents == 4 and merged.tokens == exact.tokens
+    # With room for every n-gram and a wide sketch, the estimates are exact
+    assert merged.report(10)['bigrams'] == exact.report(10)['bigrams']
+    assert merged.report(10)['trigrams'] == exact.report(10)['trigrams']
+
+    # Merging a sketch into exact counts turns them into a sketch
+    combined = NgramStats('exact')
+    combined.add_tokens(documents[0])
+    assert combined.merge(NgramStats.load(path)).is_sketch
+
+
+def test_auto_mode_switches_to_sketches():
+    stats = NgramStats('auto', width=1 << 14, capacity=2000, exact_limit=100)
+    for tokens in corpus():
+        stats.add_tokens(tokens)
+    assert stats.is_sketch and stats.mode == 'sketch'
+    assert stats.top_bigrams(5)
@@ -0,0 +1,48 @@
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import file_processor
+from ledger import close_ledgers
+from output_writer import JsonLinesWriter, PerFileWriter, iter_results
+
+
+def test_text_by_reference_accepts_records_without_text(tmp_path):
+    writer = JsonLinesWriter(str(tmp_path), compress=False, text_by_reference=True)
+    writer.write('a.txt', {'extracted_text': 'same text', 'analysis_results': {'n': 1}})
+    writer.write('b.json', {'analysis_results': {'n': 2}})
+    writer.write('c.txt', {'extracted_text': 'same text', 'analysis_results': {'n': 3}})
+    writer.close()
+    records = list(iter_results(str(tmp_path), resolve_text=True))
+    assert [record['analysis_results']['n'] for record in records] == [1, 2, 3]
+    assert records[0]['extracted_text'] == records[2]['extracted_text'] == 'same text'
+    assert 'extracted_text' not in records[1]
+    texts = [name for name in os.listdir(tmp_path) if name.startswith('texts-')]
+    assert len(texts) == 1
+
+
+def test_same_name_in_different_folders_gets_separate_results(tmp_path, monkeypatch):
+    paths = [tmp_path / 'in' / 'a.txt', tmp_path / 'in' / 'sub' / 'a.txt']
+    for index, path in enumerate(paths):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f'document {index}', encoding='utf-8')
+    monkeypatch.setattr(file_processor, 'process_file',
+                        lambda file_path, *args: {'extracted_text': open(file_path).read()})
+    output_dir = tmp_path / 'out'
+    log_file = str(tmp_path / 'processed_files.json')
+    try:
+        for path in paths:
+            file_processor.analyze_and_save(str(path), str(output_dir), log_file)
+    finally:
+        close_ledgers()
+    written = {}
+    for name in os.listdir(output_dir):
+        with open(output_dir / name, encoding='utf-8') as file:
+            written[name] = json.load(file)['extracted_text']
+    assert sorted(written.values()) == ['document 0', 'document 1']
+    assert all(name.startswith('a.txt_') and name.endswith('_analysis.json') for name in written)
+
+    writer = PerFileWriter(str(tmp_path / 'writer'))
+    assert writer.write(str(paths[0]), {}) != writer.write(str(paths[1]), {})
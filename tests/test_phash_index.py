@@ -0,0 +1,59 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+cv2 = pytest.importorskip('cv2')
+pytesseract = pytest.importorskip('pytesseract')
+
+from phash_index import PHashIndex
+from text_extraction import TextExtractor
+
+
+def render(path, lines):
+    image = np.full((400, 800, 3), 255, np.uint8)
+    for row, line in enumerate(lines):
+        cv2.putText(image, line, (40, 90 + row * 110), cv2.FONT_HERSHEY_SIMPLEX, 1.6, (0, 0, 0), 3)
+    cv2.imwrite(str(path), image)
+    return str(path)
+
+
+@pytest.fixture
+def extractor(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_ocr(image, config=''):
+        calls.append(image.size)
+        return f"region {len(calls)}"
+
+    monkeypatch.setattr(pytesseract, 'image_to_string', fake_ocr)
+    index = PHashIndex(str(tmp_path / 'phash.sqlite3'))
+    extractor = TextExtractor(mode='per_box', phash_index=index, preprocess_engine='legacy')
+    extractor.ocr_calls = calls
+    yield extractor
+    index.close()
+
+
+@pytest.mark.parametrize('first, second', [
+    (['confirmed', '100', '2,340'], ['rejected', '900', '8,115']),
+    # Same words, so the boxes line up; only a digit differs
+    (['confirmed', '100', '2,340'], ['confirmed', '900', '2,340']),
+])
+def test_same_layout_with_different_text_misses(tmp_path, extractor, first, second):
+    extractor.process_image(render(tmp_path / 'first.png', first))
+    calls = len(extractor.ocr_calls)
+    assert calls > 0
+    results = extractor.process_image(render(tmp_path / 'second.png', second))
+    assert len(extractor.ocr_calls) > calls
+    assert results and all(result['text'] != 'region 1' for result in results)
+
+
+def test_identical_image_reuses_ocr(tmp_path, extractor):
+    lines = ['confirmed', '100', '2,340']
+    first = extractor.process_image(render(tmp_path / 'first.png', lines))
+    calls = len(extractor.ocr_calls)
+    assert extractor.process_image(render(tmp_path / 'copy.png', lines)) == first
+    assert len(extractor.ocr_calls) == calls
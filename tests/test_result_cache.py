@@ -0,0 +1,29 @@
+import os
+import sys
+import sqlite3
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from result_cache import ResultCache
+
+
+def test_reads_buffer_recency_until_eviction(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResultCache(path, max_bytes=10 ** 6, evict_every=1000)
+    for key in ('a', 'b', 'c'):
+        cache.put('text', key, key * 100)
+    changes = cache._conn.total_changes
+    assert cache.get('text', 'a') == 'a' * 100
+    # A hit writes nothing until the next eviction or close
+    assert cache._conn.total_changes == changes
+    cache.close()
+
+    with sqlite3.connect(path) as conn:
+        order = [row[0] for row in conn.execute('SELECT key FROM entries ORDER BY last_access')]
+    assert order[-1] == 'a'
+
+    # The recently read entry survives eviction; the oldest unread one goes first
+    cache = ResultCache(path, max_bytes=250)
+    assert cache.evict() == 1
+    assert cache.get('text', 'b') is None and cache.get('text', 'a') is not None
+    cache.close()
@@ -0,0 +1,39 @@
+import io
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from streaming import iter_json_strings
+
+
+def test_escaped_strings_are_split_within_chunk_size():
+    chunk_chars = 10000
+    text = ('x' * 99 + '\n') * 5000
+    document = json.dumps({'key': text})
+    pieces = list(iter_json_strings(io.StringIO(document), chunk_chars))
+    assert ''.join(pieces) == text
+    # A piece may only overshoot by the escape sequence that completed it
+    assert all(len(piece) <= chunk_chars + 6 for piece in pieces)
+    assert len(pieces) > 1
+
+
+def test_long_unescaped_strings_are_split_within_chunk_size():
+    chunk_chars = 10000
+    text = 'y' * 50000
+    pieces = list(iter_json_strings(io.StringIO(json.dumps([text, {'k': 'v'}])), chunk_chars))
+    assert ''.join(pieces[:-1]) == text and pieces[-1] == 'v'
+    assert all(len(piece) <= chunk_chars + 6 for piece in pieces)
+
+
+def test_tiny_chunks_keep_unicode_escapes_whole(tmp_path):
+    from file_processor import _read_text_file
+    text = 'héllo ☃ w\U0001F600rld'
+    document = json.dumps({'a': text})
+    for chunk_chars in range(1, 8):
+        assert ''.join(iter_json_strings(io.StringIO(document), chunk_chars)) == text
+    # The non-streamed reader passes the file size, which is tiny here
+    path = tmp_path / 'tiny.json'
+    path.write_text(json.dumps('é'), encoding='utf-8')
+    assert _read_text_file(str(path)) == 'é'